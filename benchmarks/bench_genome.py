@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Compares dnas stored as lists with dnas stored as Genomes: the memory a
+generation of children takes beyond the genes they share with their parents,
+and the time it takes to read every gene in order, as the creatures of
+example.py do every frame in Creature.pre_update().
+
+Run from the repository root: python3 benchmarks/bench_genome.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gengine  # noqa: E402
+
+POPULATION = 100
+DNA_SIZE = 300
+CHUNK_SIZE = 32
+GENERATIONS = 20
+
+
+class Individual(gengine.BaseIndividualMixin):
+    pass
+
+
+def create_population(chunk_size):
+    population = []
+    for _ in range(POPULATION):
+        dna = [(random.random(), random.random()) for _ in range(DNA_SIZE)]
+        if chunk_size is not None:
+            dna = gengine.Genome(dna, chunk_size)
+        ind = Individual()
+        ind.set_dna(dna)
+        population.append(ind)
+    return population
+
+
+def breed(population):
+    """
+    Breeds a generation the way example.py does: a random breakpoint
+    crossover followed by the mutation of a single gene.
+    """
+    combinator = gengine.RandomBreakpointCombinator()
+    children = []
+    for _ in range(POPULATION):
+        p1, p2 = random.sample(population, 2)
+        dna = combinator.combine(p1, p2)
+        dna[random.randrange(DNA_SIZE)] = (random.random(), random.random())
+        ind = Individual()
+        ind.set_dna(dna)
+        children.append(ind)
+    return children
+
+
+def measure_memory(chunk_size):
+    population = create_population(chunk_size)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    children = breed(population)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del children
+    return after - before
+
+
+def measure_reads(chunk_size):
+    population = create_population(chunk_size)
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(GENERATIONS):
+            for step in range(DNA_SIZE):
+                for ind in population:
+                    ind.get_dna()[step]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / (GENERATIONS * DNA_SIZE * POPULATION)
+
+
+def main():
+    random.seed(1)
+    print('{} individuals with {} genes, chunks of {}'.format(POPULATION, DNA_SIZE, CHUNK_SIZE))
+    for name, chunk_size in (('list', None), ('Genome', CHUNK_SIZE)):
+        memory = measure_memory(chunk_size)
+        read = measure_reads(chunk_size)
+        print('{:>7}: {:7.0f} bytes per child, {:5.1f} ns per gene read'.format(
+            name, memory / POPULATION, read * 1e9))
+
+
+if __name__ == '__main__':
+    main()
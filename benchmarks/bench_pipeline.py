@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Compares evaluating a whole generation before breeding the next one with
+the pipelined mode of the engine, which breeds while the evaluation
+finishes. evaluate_fitness() sleeps, standing in for an external
+simulation, and is run by a scheduler.EvaluationScheduler with threads.
+
+  * straggler: 80 individuals evaluated by 8 threads in 20 ms each, but for
+  one random individual per generation that takes 0.5 s, for 4 generations.
+  * throughput: 2000 individuals with 300 genes evaluated by 16 threads in
+  5 ms each, for 5 generations.
+
+Run from the repository root: python3 benchmarks/bench_pipeline.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gengine  # noqa: E402
+import scheduler  # noqa: E402
+
+PIPELINE_FRACTIONS = (None, 0.5, 0.8)
+
+
+class SleepingClient(gengine.BaseClient):
+    def __init__(self, population, genes, seconds, straggler_seconds, generations,
+                 pipeline_fraction):
+        self.population = population
+        self.genes = genes
+        self.seconds = seconds
+        self.straggler_seconds = straggler_seconds
+        self.generations = generations
+        self.pipeline_fraction = pipeline_fraction
+        self.engine = None
+        self.straggler = None
+
+    def get_configuration(self):
+        config = {'population_size': self.population,
+                  'mutation_p': 0.02,
+                  'max_generations': self.generations}
+        if self.pipeline_fraction is not None:
+            config['pipeline_fraction'] = self.pipeline_fraction
+        return config
+
+    def on_init(self, engine):
+        self.engine = engine
+        engine.set_selector(gengine.TournamentSelector(3))
+
+    def on_new_population(self, generation):
+        if self.straggler_seconds:
+            self.straggler = random.choice(list(self.engine.population_iterator()))
+
+    def create_dna(self):
+        return [random.uniform(-5, 5) for _ in range(self.genes)]
+
+    def mutate_dna(self, dna):
+        dna[random.randrange(len(dna))] = random.uniform(-5, 5)
+        return dna
+
+    def create_individual(self):
+        return gengine.BaseIndividualMixin()
+
+    def evaluate_fitness(self, ind):
+        time.sleep(self.straggler_seconds if ind is self.straggler else self.seconds)
+        return -sum(x * x for x in ind.get_dna()[:3])
+
+
+def run(workers, **kwargs):
+    random.seed(0)
+    client = SleepingClient(**kwargs)
+    with scheduler.EvaluationScheduler(workers, speculative_factor=None) as s:
+        engine = gengine.Engine(client)
+        engine.set_scheduler(s)
+        return engine.run()
+
+
+def main():
+    print('straggler     elapsed')
+    for fraction in PIPELINE_FRACTIONS:
+        report = run(8, population=80, genes=10, seconds=0.02, straggler_seconds=0.5,
+                     generations=4, pipeline_fraction=fraction)
+        print('{:9}   {:6.2f}s'.format(str(fraction), report['elapsed']))
+
+    print('throughput    individuals/s')
+    for fraction in PIPELINE_FRACTIONS:
+        report = run(16, population=2000, genes=300, seconds=0.005, straggler_seconds=0,
+                     generations=5, pipeline_fraction=fraction)
+        print('{:9}   {:6.0f}'.format(str(fraction), report['evaluations'] / report['elapsed']))
+
+
+if __name__ == '__main__':
+    main()
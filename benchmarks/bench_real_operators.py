@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compares the real-valued crossover and mutation operators with gene
+shuffling crossover and mutation that replaces a gene with a random value,
+by minimizing the sphere function: the sum of the squares of ten values in
+[-5, 5]. Reports how many evaluations each needs to get close to the
+minimum, and the best fitness reached within the evaluation budget.
+
+Run from the repository root: python3 benchmarks/bench_real_operators.py
+"""
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gengine  # noqa: E402
+
+GENES = 10
+LOW = -5.0
+HIGH = 5.0
+POPULATION = 50
+MUTATION_P = 0.1
+TARGET_FITNESS = -0.01
+MAX_EVALUATIONS = 20000
+RUNS = 10
+
+
+class Individual(gengine.BaseIndividualMixin):
+    pass
+
+
+class SphereClient(gengine.BaseClient):
+    def __init__(self, combinator, mutator):
+        self.combinator = combinator
+        self.mutator = mutator
+
+    def get_configuration(self):
+        return {'population_size': POPULATION,
+                'mutation_p': MUTATION_P,
+                'target_fitness': TARGET_FITNESS,
+                'max_evaluations': MAX_EVALUATIONS}
+
+    def on_init(self, engine):
+        engine.set_combinator(self.combinator)
+        engine.set_selector(gengine.TournamentSelector(2))
+        if self.mutator is not None:
+            engine.set_mutator(self.mutator)
+
+    def on_new_population(self, generation):
+        pass
+
+    def create_dna(self):
+        return [random.uniform(LOW, HIGH) for _ in range(GENES)]
+
+    def mutate_dna(self, dna):
+        dna[random.randrange(GENES)] = random.uniform(LOW, HIGH)
+        return dna
+
+    def create_individual(self):
+        return Individual()
+
+    def evaluate_fitness(self, ind):
+        return -sum(x * x for x in ind.get_dna())
+
+
+OPERATORS = (
+    ('element-wise + random gene',
+     lambda: (gengine.ElementWiseCombinator(), None)),
+    ('BLX-0.5 + Gaussian',
+     lambda: (gengine.BlendCombinator(0.5, LOW, HIGH), gengine.GaussianMutator(0.1, LOW, HIGH))),
+    ('SBX + polynomial',
+     lambda: (gengine.SimulatedBinaryCombinator(15, LOW, HIGH),
+              gengine.PolynomialMutator(20, LOW, HIGH))),
+)
+
+
+def main():
+    print('{} values, population {}, {} runs, budget {} evaluations'.format(
+        GENES, POPULATION, RUNS, MAX_EVALUATIONS))
+    print('{:28} {:>8} {:>18} {:>12}'.format('operators', 'reached', 'median evaluations',
+                                             'median best'))
+    for name, create in OPERATORS:
+        evaluations = []
+        best = []
+        reached = 0
+        for run in range(RUNS):
+            random.seed(run)
+            engine = gengine.Engine(SphereClient(*create()))
+            report = engine.run()
+            reached += report['reason'] == 'target_fitness'
+            evaluations.append(report['evaluations'])
+            best.append(report['best_fitness'])
+        print('{:28} {:>5}/{:<2} {:>18.0f} {:>12.4f}'.format(
+            name, reached, RUNS, statistics.median(evaluations), statistics.median(best)))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,7 @@ import gengine
 import pygame
 import time
 import pickle
+import glob
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -34,6 +35,35 @@ SCROLL_DOWN = 5
 
 STATEFILE = 'state.pickle'
 
+# Layouts saved as scenarios are loaded from files matching SCENARIO_FILES.
+# When there are any, each creature is also simulated in every scenario, and
+# its fitness is the mean or the worst of its scores, as set by
+# SCENARIO_AGGREGATE ('mean' or 'worst').
+SCENARIO_FILES = 'scenario_*.pickle'
+SCENARIO_AGGREGATE = 'mean'
+
+STEP_TIME = 0.01
+
+# When set, children get forces blended from their parents' and mutations
+# nudge a force rather than replacing it.
+REAL_VALUED_OPERATORS = False
+
+# When set, fitness is reported as separate objectives (closeness to the
+# target, early arrival and survival) and parents are picked by Pareto
+# ranking instead of by a hand-tuned combination of them.
+MULTI_OBJECTIVE = False
+
+# Every SNAPSHOT_INTERVAL steps the state of each creature is saved, at most
+# SNAPSHOT_LIMIT times per creature. A child that inherits the first genes of
+# a parent unchanged resumes from the parent's latest snapshot within them
+# instead of being simulated from the launcher.
+SNAPSHOT_INTERVAL = 25
+SNAPSHOT_LIMIT = 12
+
+# Dnas are stored as gengine.Genomes with chunks of this many forces, which
+# children share with their parents. None stores them as lists.
+GENOME_CHUNK_SIZE = 32
+
 
 class Thing:
     def __init__(self):
@@ -118,6 +148,59 @@ class Creature(Thing, gengine.BaseIndividualMixin):
         self.crashed = False
         self.completed = False
         self.arrival_time = None
+        self.inheritance = (None, 0)
+        self.snapshots = []
+        self.resume_step = 0
+        self.resume_state = None
+
+    def reset(self, x, y):
+        """
+        Restores the creature to the state of a newly created one positioned
+        at (x, y), without allocating new objects.
+        """
+        self.set_pos(x, y)
+        self.velocity.x = 0
+        self.velocity.y = 0
+        self.accel.x = 0
+        self.accel.y = 0
+        self.color = BLUE
+        self.active = True
+        self.fitness = 0
+        self.crashed = False
+        self.completed = False
+        self.arrival_time = None
+        # The snapshots of the previous life may still be needed by the
+        # children, so start a new list rather than clearing it.
+        self.snapshots = []
+        self.resume_step = 0
+        self.resume_state = None
+
+    def snapshot(self):
+        return (self.pos.x, self.pos.y, self.velocity.x, self.velocity.y,
+                self.crashed, self.completed, self.arrival_time, self.active,
+                self.color)
+
+    def restore(self, state):
+        (self.pos.x, self.pos.y, self.velocity.x, self.velocity.y,
+         self.crashed, self.completed, self.arrival_time, self.active,
+         self.color) = state
+
+    def resume_from(self, snapshots, length):
+        """
+        Arranges for the creature to skip the steps before the latest of the
+        snapshots taken within the first length steps.
+        """
+        for i in range(len(snapshots) - 1, -1, -1):
+            step, state = snapshots[i]
+            if step <= length:
+                if step > 0:
+                    self.resume_step = step
+                    self.resume_state = state
+                    self.snapshots = snapshots[:i]
+                return
+
+    def is_waiting(self, counter):
+        return counter < self.resume_step
 
     def complete(self, t):
         if not self.completed:
@@ -145,6 +228,15 @@ class Creature(Thing, gengine.BaseIndividualMixin):
 
 DNA_SIZE = 300
 
+
+class VectorCodec(gengine.RealCodec):
+    def to_values(self, gene):
+        return (gene.x, gene.y)
+
+    def from_values(self, values):
+        return Vector2D(values[0], values[1])
+
+
 class Client(gengine.BaseClient):
     def __init__(self):
         self.width = 0
@@ -167,9 +259,17 @@ class Client(gengine.BaseClient):
         self.all_inactive = True
         self.generation = 0
 
+        self.parent_snapshots = None
+        self.layout_changed = False
+        self.counter = 0
+
+        self.scenarios = []
+
     def get_configuration(self):
         return {'population_size': 100,
-                'mutation_p': MUTATION_SPEEDS[self.mutate_index]}
+                'mutation_p': MUTATION_SPEEDS[self.mutate_index],
+                'track_inheritance': True,
+                'genome_chunk_size': GENOME_CHUNK_SIZE}
 
     def create_dna(self):
         dna = []
@@ -189,9 +289,52 @@ class Client(gengine.BaseClient):
         c.set_pos(self.launcher.pos.x, self.launcher.pos.y)
         return c
 
+    def reset_individual(self, ind, dna):
+        ind.reset(self.launcher.pos.x, self.launcher.pos.y)
+        ind.set_dna(dna)
+
+    def evaluate_population(self, individuals):
+        fitness_list = [self.evaluate_fitness(ind) for ind in individuals]
+        if not self.scenarios:
+            return fitness_list
+
+        results, end_time = self.simulate_scenarios(individuals)
+        aggregated = []
+        for fitness, result in zip(fitness_list, results):
+            scores = [fitness]
+            for d, arrival_time, crashed, completed in result:
+                scores.append(self.score(d, arrival_time, end_time, crashed, completed))
+            aggregated.append(self.aggregate(scores))
+        return aggregated
+
+    def aggregate(self, scores):
+        if MULTI_OBJECTIVE:
+            return tuple(self.aggregate(list(objective)) for objective in zip(*scores))
+        if SCENARIO_AGGREGATE == 'worst':
+            return min(scores)
+        return sum(scores) / len(scores)
+
     def evaluate_fitness(self, ind):
         d = ind.pos.distance(self.target.pos)
 
+        if ind.arrival_time is None:
+            ind.arrival_time = self.now
+
+        if ind.has_completed():
+            if self.best_time is None or ind.arrival_time < self.best_time:
+                self.best_time = ind.arrival_time
+
+            self.complete_count += 1
+
+        return self.score(d, ind.arrival_time, self.now,
+                          ind.has_crashed(), ind.has_completed())
+
+    def score(self, d, arrival_time, end_time, crashed, completed):
+        """
+        Returns the fitness of a creature that ended up at distance d from
+        the target, having crashed or completed at arrival_time, or at the
+        end_time of the simulation if arrival_time is None.
+        """
         # Avoid division by 0.
         if d < 1:
             d = 1
@@ -202,10 +345,10 @@ class Client(gengine.BaseClient):
         # The arrival factor is the arrival time normalized
         # between 0 and 1, where 0 represents the start of
         # the simulation and 1 the end of the simulation.
-        if ind.arrival_time is None:
-            ind.arrival_time = self.now
+        if arrival_time is None:
+            arrival_time = end_time
 
-        arrival_factor = ind.arrival_time / self.now
+        arrival_factor = arrival_time / end_time
 
         # Special case if individual arrives right away. This can happen for
         # instance if target and launcher are extremeoy close, so it's kind of
@@ -213,17 +356,17 @@ class Client(gengine.BaseClient):
         if arrival_factor == 0:
             arrival_factor = 1
 
-        if ind.has_crashed():
+        if MULTI_OBJECTIVE:
+            earliness = 1 - arrival_factor if completed else 0
+            survival = arrival_factor if crashed else 1
+            return (fitness, earliness, survival)
+
+        if crashed:
             # Give more penalty to objects that crashed early
             fitness *= pow(arrival_factor, 3)
-        if ind.has_completed():
+        if completed:
             # Boost objects that completed early
             fitness /= (pow(arrival_factor, 3))
-
-            if self.best_time is None or ind.arrival_time < self.best_time:
-                self.best_time = ind.arrival_time
-
-            self.complete_count += 1
         return fitness
 
     def create_random_unit_vector(self):
@@ -231,22 +374,85 @@ class Client(gengine.BaseClient):
         return Vector2D(cos(angle), sin(angle))
 
     def check_pos(self, thing, t):
+        self.check_collisions(thing, t, self.target, self.obstacles)
+        if thing.active:
+            self.all_inactive = False
+
+    def check_collisions(self, thing, t, target, obstacles):
         if thing.pos.x < 0 or thing.pos.x > self.width or thing.pos.y < 0 or thing.pos.y > self.height:
             thing.crash(t)
 
-        if thing.pos.distance(self.target.pos) < thing.radius + self.target.radius:
+        if thing.pos.distance(target.pos) < thing.radius + target.radius:
             thing.complete(t)
 
-        for obstacle in self.obstacles:
+        for obstacle in obstacles:
             if thing.pos.distance(obstacle.pos) < thing.radius + obstacle.radius:
                 thing.crash(t)
 
-        if thing.active:
-            self.all_inactive = False
+    def simulate_scenarios(self, individuals):
+        """
+        Simulates a copy of each creature in every scenario, without drawing,
+        with the same code as the live simulation. Returns, for each
+        creature, a list with a (distance, arrival_time, crashed, completed)
+        tuple per scenario, and the time at which the simulation ended.
+        """
+        results = [[] for ind in individuals]
+        end_time = 0
+        for scenario in self.scenarios:
+            target = scenario['target']
+            obstacles = scenario['obstacles']
+            copies = []
+            for ind in individuals:
+                c = Creature()
+                c.set_pos(self.launcher.pos.x, self.launcher.pos.y)
+                c.set_dna(ind.get_dna())
+                copies.append(c)
+
+            active = copies
+            t = 0
+            for step in range(DNA_SIZE):
+                if not active:
+                    break
+                t = (step + 1) * STEP_TIME
+                for c in active:
+                    c.update(step, STEP_TIME)
+                    self.check_collisions(c, t, target, obstacles)
+                # A creature that crashed or completed doesn't move again
+                active = [c for c in active if not (c.crashed or c.completed)]
+            end_time = max(end_time, t)
+
+            for result, c in zip(results, copies):
+                result.append((c.pos.distance(target.pos), c.arrival_time,
+                               c.crashed, c.completed))
+        return results, end_time
 
     def update(self, thing, counter, dt):
+        if thing.is_waiting(counter):
+            return
+        if counter == thing.resume_step and thing.resume_state is not None:
+            thing.restore(thing.resume_state)
+        if counter % SNAPSHOT_INTERVAL == 0 and len(thing.snapshots) < SNAPSHOT_LIMIT:
+            thing.snapshots.append((counter, thing.snapshot()))
         thing.update(counter, dt)
 
+    def invalidate_snapshots(self):
+        """
+        Snapshots taken with a different layout can't be resumed from. This
+        goes for the snapshots kept for the next generation, and for those
+        that creatures of this generation are still waiting to resume from.
+        These creatures are instead simulated in the new layout up to the
+        current step.
+        """
+        self.layout_changed = True
+        for ind in self.engine.population_iterator():
+            if ind.resume_state is None or not ind.is_waiting(self.counter):
+                continue
+            ind.resume_step = 0
+            ind.resume_state = None
+            for step in range(self.counter):
+                self.update(ind, step, STEP_TIME)
+                self.check_pos(ind, (step + 1) * STEP_TIME)
+
     def draw(self, thing):
         thing.draw(self.screen)
 
@@ -275,6 +481,8 @@ class Client(gengine.BaseClient):
                     self.change_mutation(-1)
                 elif event.key == pygame.K_F5:
                     self.save()
+                elif event.key == pygame.K_F6:
+                    self.add_scenario()
                 elif event.key == pygame.K_F9:
                     self.load()
             elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -290,16 +498,20 @@ class Client(gengine.BaseClient):
                         new_obstacle.set_pos(event.pos[0], event.pos[1])
                         self.obstacles.append(new_obstacle)
                         self.draggables.append(new_obstacle)
+                        self.invalidate_snapshots()
                     else:
                         if thing.removable:
                             self.obstacles.remove(thing)
                             self.draggables.remove(thing)
+                            self.invalidate_snapshots()
                 elif event.button == SCROLL_UP:
                     if thing is not None:
                         thing.set_radius(constrain(thing.radius + 10, 10, 100))
+                        self.invalidate_snapshots()
                 elif event.button == SCROLL_DOWN:
                     if thing is not None:
                         thing.set_radius(constrain(thing.radius - 10, 10, 100))
+                        self.invalidate_snapshots()
 
             elif event.type == pygame.MOUSEBUTTONUP:
                 self.dragging = None
@@ -311,6 +523,7 @@ class Client(gengine.BaseClient):
 
                     # Invalidate best time since circumstances have changed.
                     self.best_time = None
+                    self.invalidate_snapshots()
 
     def find_thing(self, pos):
         x = Vector2D(pos[0], pos[1])
@@ -326,6 +539,16 @@ class Client(gengine.BaseClient):
         self.screen = pygame.display.set_mode((self.width, self.height))
         self.target = Target()
         self.engine = engine
+        # Children keep the first part of one parent's dna unchanged, which
+        # lets them resume from that parent's snapshots.
+        engine.set_combinator(gengine.RandomBreakpointCombinator())
+        if REAL_VALUED_OPERATORS:
+            codec = VectorCodec()
+            engine.set_combinator(gengine.BlendCombinator(0.5, -FORCE_FACTOR, FORCE_FACTOR, codec))
+            engine.set_mutator(gengine.GaussianMutator(FORCE_FACTOR / 10, -FORCE_FACTOR,
+                                                       FORCE_FACTOR, codec))
+        if MULTI_OBJECTIVE:
+            engine.set_selector(gengine.ParetoSelector())
 
         self.launcher = Launcher()
         self.launcher.set_pos(self.width / 2, self.height - 100)
@@ -351,6 +574,8 @@ class Client(gengine.BaseClient):
 
         self.font = pygame.font.SysFont('sans', 20)
 
+        self.load_scenarios()
+
     def draw_text(self, text, x, y):
         s = self.font.render(text, True, WHITE)
         self.screen.blit(s, (x, y))
@@ -379,9 +604,9 @@ class Client(gengine.BaseClient):
         self.complete_count = 0
         self.clock.reset()
         self.clock.start()
-        counter = 0
+        self.counter = 0
         accumulator = 0.0
-        dt = 0.01
+        dt = STEP_TIME
         while not self.exit_requested:
             self.all_inactive = True
             self.handle_input()
@@ -396,18 +621,21 @@ class Client(gengine.BaseClient):
 
                 while accumulator >= dt:
                     for ind in self.engine.population_iterator():
-                        self.update(ind, counter, dt)
+                        self.update(ind, self.counter, dt)
 
                     for ind in self.engine.population_iterator():
-                        self.check_pos(ind, self.now)
+                        if ind.is_waiting(self.counter):
+                            self.all_inactive = False
+                        else:
+                            self.check_pos(ind, self.now)
 
                     accumulator -= dt
                     self.now += dt
 
-                    counter += 1
-                    if counter == DNA_SIZE or self.all_inactive:
+                    self.counter += 1
+                    if self.counter == DNA_SIZE or self.all_inactive:
                         self.engine.evolve()
-                        counter = 0
+                        self.counter = 0
                         self.complete_count = 0
                         self.clock.reset()
                         self.clock.start()
@@ -419,12 +647,52 @@ class Client(gengine.BaseClient):
     def on_new_population(self, generation):
         self.generation = generation
 
-    def save(self):
+        if self.parent_snapshots is None:
+            return
+        for ind in self.engine.population_iterator():
+            parent, length = ind.get_inheritance()
+            if parent is not None:
+                ind.resume_from(self.parent_snapshots[parent], length)
+        self.parent_snapshots = None
+
+    def save(self, filename=STATEFILE):
         data = {'target': self.target,
                 'obstacles': self.obstacles}
-        with open(STATEFILE, 'wb') as f:
+        with open(filename, 'wb') as f:
             pickle.dump(data, f)
 
+    def add_scenario(self):
+        """
+        Saves the current layout as a new scenario that every creature is
+        evaluated in from now on.
+        """
+        self.save(self.next_scenario_filename())
+        self.load_scenarios()
+
+    def next_scenario_filename(self):
+        """
+        Returns a scenario filename numbered after the highest existing one,
+        so that no scenario is overwritten after others have been deleted.
+        """
+        prefix, suffix = SCENARIO_FILES.split('*')
+        numbers = [0]
+        for filename in glob.glob(SCENARIO_FILES):
+            number = filename[len(prefix):len(filename) - len(suffix)]
+            if number.isdigit():
+                numbers.append(int(number))
+        return SCENARIO_FILES.replace('*', str(max(numbers) + 1))
+
+    def load_scenarios(self):
+        scenarios = []
+        for filename in sorted(glob.glob(SCENARIO_FILES)):
+            try:
+                with open(filename, 'rb') as f:
+                    scenarios.append(pickle.load(f))
+            except:
+                print('Could not load scenario {}'.format(filename))
+        self.scenarios = scenarios
+        print('Scenarios: {}'.format(len(self.scenarios)))
+
     def load(self):
         data = None
         try:
@@ -438,8 +706,17 @@ class Client(gengine.BaseClient):
         self.draggables.append(self.target)
         self.draggables.extend(self.obstacles)
         self.best_time = None
+        self.invalidate_snapshots()
 
     def on_evaluated(self, generation):
+        # Keep the snapshots of this generation for its children, unless
+        # the layout changed while it was simulated.
+        if self.layout_changed:
+            self.parent_snapshots = None
+        else:
+            self.parent_snapshots = [ind.snapshots for ind in self.engine.population_iterator()]
+        self.layout_changed = False
+
         self.latest_complete_count = self.complete_count
         print("Generation {} end".format(generation))
         print('  Completed: {}'.format(self.complete_count))
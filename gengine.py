@@ -1,9 +1,345 @@
 #!/usr/bin/env python3
+import bisect
+import heapq
+import itertools
+import math
 import random
 import string
+import threading
 import time
 from utils import constrain
 
+# Number of children bred at a time by the background thread of a pipelined
+# engine, between which it gives way to the evaluation.
+PIPELINE_BATCH = 16
+
+
+class Genome:
+    """
+    Sequence of genes stored as chunks that are shared between genomes.
+    The chunks are tuples, so a genome built from the chunks of its parents
+    only needs new chunks where its genes differ from theirs. Setting a gene
+    copies the one chunk that holds it, leaving other genomes that share the
+    chunk unchanged. The list of chunks itself is not shared, so a genome
+    still takes one reference per chunk.
+    """
+    def __init__(self, genes=(), chunk_size=32):
+        if chunk_size < 1:
+            raise RuntimeError('Chunk size must be at least 1')
+        genes = list(genes)
+        self.chunk_size = chunk_size
+        self.length = len(genes)
+        self.chunks = [tuple(genes[i:i + chunk_size])
+                       for i in range(0, len(genes), chunk_size)]
+
+    @classmethod
+    def from_chunks(cls, chunks, chunk_size, length):
+        genome = cls.__new__(cls)
+        genome.chunk_size = chunk_size
+        genome.length = length
+        genome.chunks = chunks
+        return genome
+
+    def copy(self):
+        """
+        Returns a genome sharing all chunks with this one.
+        """
+        return Genome.from_chunks(list(self.chunks), self.chunk_size, self.length)
+
+    def is_compatible(self, other):
+        return isinstance(other, Genome) and other.chunk_size == self.chunk_size \
+            and other.length == self.length
+
+    def splice(self, other, n):
+        """
+        Returns a genome with the first n genes of this genome and the rest
+        from other, sharing all chunks but the one where they meet.
+        """
+        c, r = divmod(n, self.chunk_size)
+        chunks = self.chunks[:c]
+        if r:
+            chunks.append(self.chunks[c][:r] + other.chunks[c][r:])
+            c += 1
+        chunks.extend(other.chunks[c:])
+        return Genome.from_chunks(chunks, self.chunk_size, self.length)
+
+    def common_prefix(self, other):
+        """
+        Returns the number of leading genes that are the very same objects
+        in both genomes.
+        """
+        n = 0
+        for c1, c2 in zip(self.chunks, other.chunks):
+            if c1 is c2:
+                n += len(c1)
+                continue
+            for g1, g2 in zip(c1, c2):
+                if g1 is not g2:
+                    return n
+                n += 1
+        return n
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.chunks)
+
+    def _index(self, i):
+        if i < 0:
+            i += self.length
+        if i < 0 or i >= self.length:
+            raise IndexError('Genome index out of range')
+        return divmod(i, self.chunk_size)
+
+    def __getitem__(self, i):
+        if i.__class__ is int and i >= 0:
+            # Reading genes in order is the hot path of most clients. An
+            # index past the end is still caught, by the chunk lookups.
+            return self.chunks[i // self.chunk_size][i % self.chunk_size]
+        if isinstance(i, slice):
+            return list(self)[i]
+        c, r = self._index(i)
+        return self.chunks[c][r]
+
+    def __setitem__(self, i, gene):
+        c, r = self._index(i)
+        chunk = self.chunks[c]
+        self.chunks[c] = chunk[:r] + (gene,) + chunk[r + 1:]
+
+    def __eq__(self, other):
+        if isinstance(other, Genome) and other.chunks == self.chunks:
+            return True
+        try:
+            return len(other) == self.length and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def copy_dna(dna):
+    """
+    Returns a copy of dna that genes can be set in without affecting dna.
+    """
+    if isinstance(dna, Genome):
+        return dna.copy()
+    return list(dna)
+
+
+class RealCodec:
+    """
+    Converts genes to and from tuples of real values for the real-valued
+    operators below. By default a gene is a single number. Subclass it for
+    other kinds of genes, e.g. vectors.
+    """
+    def to_values(self, gene):
+        return (gene,)
+
+    def from_values(self, values):
+        return values[0]
+
+
+class RealValuedOperator:
+    """
+    Base class of the real-valued crossover and mutation operators. Values
+    are kept within low and high, which can either be numbers or lists with
+    one bound per gene. None means unbounded.
+    """
+    def __init__(self, low=None, high=None, codec=None):
+        self.low = low
+        self.high = high
+        self.codec = codec if codec is not None else RealCodec()
+
+    def _gene_bound(self, bound, i, default):
+        if bound is None:
+            return default
+        if isinstance(bound, (list, tuple)):
+            return bound[i]
+        return bound
+
+    def _bounds(self, genes, width):
+        """
+        Returns the lower and upper bound of every value of a decoded dna.
+        """
+        lows = []
+        highs = []
+        for i in range(genes):
+            lows.extend([self._gene_bound(self.low, i, -math.inf)] * width)
+            highs.extend([self._gene_bound(self.high, i, math.inf)] * width)
+        return lows, highs
+
+    def _decode(self, dna):
+        """
+        Returns the values of all genes of dna as one flat list, and the
+        number of values per gene.
+        """
+        to_values = self.codec.to_values
+        values = []
+        width = 0
+        for gene in dna:
+            v = to_values(gene)
+            width = len(v)
+            if not width:
+                raise RuntimeError('Codec returned no values for a gene')
+            values.extend(v)
+        return values, width
+
+    def _encode(self, values, width):
+        if not width:
+            # Only an empty dna decodes to no values
+            return []
+        from_values = self.codec.from_values
+        return [from_values(tuple(values[i:i + width])) for i in range(0, len(values), width)]
+
+
+class RealValuedCombinator(RealValuedOperator):
+    """
+    Base class of the real-valued crossover operators. The values of every
+    parent in the mating pool are decoded once, however many children it
+    has, and all children are produced in one call to combine_all().
+    """
+    def combine(self, p1, p2):
+        return self.combine_all([(p1, p2)])[0]
+
+    def combine_all(self, pairs):
+        decoded = {}
+        bounds = None
+        children = []
+        for p1, p2 in pairs:
+            for p in (p1, p2):
+                if id(p) not in decoded:
+                    decoded[id(p)] = self._decode(p.get_dna())
+            v1, width = decoded[id(p1)]
+            v2, width = decoded[id(p2)]
+            if bounds is None:
+                bounds = self._bounds(len(v1) // width if width else 0, width)
+            children.append(self._encode(self._cross(v1, v2, *bounds), width))
+        return children
+
+
+class BlendCombinator(RealValuedCombinator):
+    """
+    BLX-alpha crossover. Each value of the child is drawn uniformly from the
+    range spanned by the parents' values, extended by alpha times its width
+    on both sides.
+    """
+    def __init__(self, alpha=0.5, low=None, high=None, codec=None):
+        super().__init__(low, high, codec)
+        self.alpha = alpha
+
+    def _cross(self, v1, v2, lows, highs):
+        uniform = random.uniform
+        alpha = self.alpha
+        child = []
+        for a, b, low, high in zip(v1, v2, lows, highs):
+            d = abs(a - b) * alpha
+            x = uniform(min(a, b) - d, max(a, b) + d)
+            child.append(min(max(x, low), high))
+        return child
+
+
+class SimulatedBinaryCombinator(RealValuedCombinator):
+    """
+    Simulated binary crossover (SBX). Each value of the child is spread
+    around the parents' values, as one point crossover of binary strings
+    would. A greater eta keeps children closer to their parents.
+    """
+    def __init__(self, eta=15, low=None, high=None, codec=None):
+        super().__init__(low, high, codec)
+        self.eta = eta
+
+    def _cross(self, v1, v2, lows, highs):
+        rand = random.random
+        exponent = 1 / (self.eta + 1)
+        child = []
+        for a, b, low, high in zip(v1, v2, lows, highs):
+            u = rand()
+            if u <= 0.5:
+                beta = (2 * u) ** exponent
+            else:
+                beta = (1 / (2 * (1 - u))) ** exponent
+            if rand() < 0.5:
+                beta = -beta
+            x = 0.5 * ((1 + beta) * a + (1 - beta) * b)
+            child.append(min(max(x, low), high))
+        return child
+
+
+class RealValuedMutator(RealValuedOperator):
+    """
+    Base class of the real-valued mutation operators. Pass it to
+    engine.set_mutator() to use it instead of client.mutate_dna(). Each gene
+    mutates with the engine's mutation probability. The genes to mutate are
+    found by drawing the gaps between them, so the cost is proportional to
+    the number of mutations rather than the length of the dna.
+    """
+    def mutate_all(self, dnas, probability):
+        if probability <= 0:
+            return dnas
+        log_q = math.log(1 - probability) if probability < 1 else None
+        mutated = []
+        for dna in dnas:
+            new_dna = None
+            i = -1
+            while True:
+                if log_q is None:
+                    i += 1
+                else:
+                    i += 1 + int(math.log(1 - random.random()) / log_q)
+                if i >= len(dna):
+                    break
+                if new_dna is None:
+                    new_dna = copy_dna(dna)
+                new_dna[i] = self._mutate_gene(new_dna[i], i)
+            mutated.append(dna if new_dna is None else new_dna)
+        return mutated
+
+    def _mutate_gene(self, gene, i):
+        low = self._gene_bound(self.low, i, -math.inf)
+        high = self._gene_bound(self.high, i, math.inf)
+        values = [min(max(self._mutate_value(x, i, low, high), low), high)
+                  for x in self.codec.to_values(gene)]
+        return self.codec.from_values(tuple(values))
+
+
+class GaussianMutator(RealValuedMutator):
+    """
+    Adds normally distributed noise to the values of a gene. sigma is the
+    standard deviation, either a number or a list with one per gene.
+    """
+    def __init__(self, sigma=1.0, low=None, high=None, codec=None):
+        super().__init__(low, high, codec)
+        self.sigma = sigma
+
+    def _mutate_value(self, x, i, low, high):
+        return x + random.gauss(0, self._gene_bound(self.sigma, i, 0))
+
+
+class PolynomialMutator(RealValuedMutator):
+    """
+    Polynomial mutation. Moves the values of a gene by a random fraction of
+    the range between its bounds, so low and high must be set. Small moves
+    are more likely the greater eta is.
+    """
+    def __init__(self, eta=20, low=None, high=None, codec=None):
+        if low is None or high is None:
+            raise RuntimeError('Polynomial mutation needs bounds')
+        super().__init__(low, high, codec)
+        self.eta = eta
+
+    def _mutate_value(self, x, i, low, high):
+        exponent = 1 / (self.eta + 1)
+        u = random.random()
+        if u < 0.5:
+            delta = (2 * u) ** exponent - 1
+        else:
+            delta = 1 - (2 * (1 - u)) ** exponent
+        return x + delta * (high - low)
+
 
 class ElementWiseCombinator:
     """
@@ -14,6 +350,8 @@ class ElementWiseCombinator:
         combined_genes = []
         p1g = p1.get_dna()
         p2g = p2.get_dna()
+        if isinstance(p1g, Genome) and p1g.is_compatible(p2g):
+            return self._combine_chunks(p1g, p2g)
         for g1, g2 in zip(p1g, p2g):
             if random.random() < 0.5:
                 combined_genes.append(g1)
@@ -21,6 +359,17 @@ class ElementWiseCombinator:
                 combined_genes.append(g2)
         return combined_genes
 
+    def _combine_chunks(self, p1g, p2g):
+        chunks = []
+        for c1, c2 in zip(p1g.chunks, p2g.chunks):
+            if c1 is c2:
+                # Nothing to choose between, so the chunk can be shared
+                chunks.append(c1)
+            else:
+                chunks.append(tuple(g1 if random.random() < 0.5 else g2
+                                    for g1, g2 in zip(c1, c2)))
+        return Genome.from_chunks(chunks, p1g.chunk_size, p1g.length)
+
 
 class RandomBreakpointCombinator:
     """
@@ -32,6 +381,8 @@ class RandomBreakpointCombinator:
         p1g = p1.get_dna()
         p2g = p2.get_dna()
         n = random.randint(0, len(p1g) - 1)
+        if isinstance(p1g, Genome) and p1g.is_compatible(p2g):
+            return p1g.splice(p2g, n)
         return p1g[0:n] + p2g[n:]
 
 
@@ -46,6 +397,514 @@ class RandomParentCombinator:
             return p2.get_dna()
 
 
+class FitnessProportionalSelector:
+    """
+    Selector that picks individuals with a probability proportional to their
+    fitness. Requires fitness to be normalized between 0 and 1.
+    """
+    normalize_fitness = True
+    vector_fitness = False
+
+    def select(self, fitness, count):
+        n = len(fitness)
+
+        # Special handling if all individuals have zero fitness
+        # In that case, just pick any
+        if not any(f > 0 for f in fitness):
+            return [random.randrange(n) for i in range(count)]
+
+        indices = []
+        for i in range(count):
+            indices.append(self._accept_reject(fitness))
+        return indices
+
+    def _accept_reject(self, fitness):
+        # Monte-Carlo style accept-reject algorithm
+        # Assumes that fitness is normalized between 0 and 1
+        n = len(fitness)
+        timeout = 1000000
+        while timeout > 0:
+            i = random.randrange(n)
+            if random.random() <= fitness[i]:
+                return i
+            timeout -= 1
+        # We can get here in case all individuals have 0 fitness
+        # so just pick any.
+        return random.randrange(n)
+
+
+class TournamentSelector:
+    """
+    Selector that draws size individuals at random and picks the fittest of
+    them. Only the order of the fitness values matters, so no normalization
+    is needed and the cost is O(count * size).
+    """
+    normalize_fitness = False
+    vector_fitness = False
+
+    def __init__(self, size=2):
+        if size < 1:
+            raise RuntimeError('Tournament size must be at least 1')
+        self.size = size
+
+    def select(self, fitness, count):
+        n = len(fitness)
+        randrange = random.randrange
+        indices = []
+        for i in range(count):
+            best = randrange(n)
+            for k in range(self.size - 1):
+                j = randrange(n)
+                if fitness[j] > fitness[best]:
+                    best = j
+            indices.append(best)
+        return indices
+
+
+class TruncationSelector:
+    """
+    Selector that picks uniformly among the fittest fraction of the
+    population. Only the order of the fitness values matters, so no
+    normalization is needed.
+    """
+    normalize_fitness = False
+    vector_fitness = False
+
+    def __init__(self, fraction=0.5):
+        if fraction <= 0 or fraction > 1:
+            raise RuntimeError('Truncation fraction must be in the range (0, 1]')
+        self.fraction = fraction
+
+    def select(self, fitness, count):
+        n = len(fitness)
+        m = max(1, int(n * self.fraction))
+        best = heapq.nlargest(m, range(n), key=fitness.__getitem__)
+        return [best[random.randrange(m)] for i in range(count)]
+
+
+def dominates(a, b):
+    """
+    Returns True if fitness vector a dominates fitness vector b, i.e. a is at
+    least as good as b in every objective and better in at least one. Greater
+    values are better.
+    """
+    better = False
+    for x, y in zip(a, b):
+        if x < y:
+            return False
+        if x > y:
+            better = True
+    return better
+
+
+class _LastMemberFront:
+    """
+    Pareto front for up to two objectives. Vectors are added best first, so
+    the last vector added is the one most likely to dominate a new vector.
+    With two objectives, it dominates it if any vector in the front does.
+    """
+    def __init__(self):
+        self.last = None
+
+    def dominates(self, f):
+        return dominates(self.last, f)
+
+    def add(self, f):
+        self.last = f
+
+
+class _StaircaseFront:
+    """
+    Pareto front for three objectives. Vectors are added best first in the
+    first objective, so only the last two objectives need to be compared.
+    These are kept as a staircase of the vectors that are not dominated in
+    those two objectives, sorted by ascending second and descending third
+    objective, so that a lookup is a binary search.
+    """
+    def __init__(self):
+        self.xs = []
+        self.ys = []
+        self.zs = []
+
+    def dominates(self, f):
+        z, x, y = f
+        k = bisect.bisect_left(self.xs, x)
+        if k == len(self.xs) or self.ys[k] < y:
+            return False
+        if self.ys[k] > y or self.xs[k] > x:
+            return True
+        # Same second and third objective, so the first decides
+        return self.zs[k] > z
+
+    def add(self, f):
+        z, x, y = f
+        xs = self.xs
+        ys = self.ys
+        k = bisect.bisect_left(xs, x)
+        if k < len(xs) and ys[k] >= y:
+            return
+        # Drop the vectors of the staircase that f dominates
+        end = bisect.bisect_right(xs, x, k)
+        start = end
+        while start > 0 and ys[start - 1] <= y:
+            start -= 1
+        xs[start:end] = [x]
+        ys[start:end] = [y]
+        self.zs[start:end] = [z]
+
+
+class _Staircase:
+    """
+    Set of points that answers whether any of them is at least as great as a
+    given point in two of its coordinates, starting at level. Only the
+    points not dominated by another are kept, sorted by ascending first and
+    descending second coordinate, so that a lookup is a binary search.
+    """
+    def __init__(self):
+        self.xs = []
+        self.ys = []
+
+    def covers(self, p, level):
+        k = bisect.bisect_left(self.xs, p[level])
+        return k < len(self.xs) and self.ys[k] >= p[level + 1]
+
+    def add(self, p, level):
+        x = p[level]
+        y = p[level + 1]
+        xs = self.xs
+        ys = self.ys
+        k = bisect.bisect_left(xs, x)
+        if k < len(xs) and ys[k] >= y:
+            return
+        # Drop the points that p dominates
+        end = bisect.bisect_right(xs, x, k)
+        start = end
+        while start > 0 and ys[start - 1] <= y:
+            start -= 1
+        xs[start:end] = [x]
+        ys[start:end] = [y]
+
+
+class _DominanceTree:
+    """
+    Set of points that answers whether any of them is at least as great as a
+    given point in the given number of coordinates, starting at level. The
+    coordinates are ranks in range(size). A Fenwick tree over the first
+    coordinate, counted from the greatest rank, holds a set of the points
+    for the remaining coordinates in each node, so that the points with at
+    least a given first coordinate are covered by O(log size) nodes.
+    """
+    def __init__(self, size, dimensions):
+        self.size = size
+        self.dimensions = dimensions
+        self.nodes = {}
+
+    def covers(self, p, level):
+        nodes = self.nodes
+        i = self.size - p[level]
+        while i > 0:
+            node = nodes.get(i)
+            if node is not None and node.covers(p, level + 1):
+                return True
+            i &= i - 1
+        return False
+
+    def add(self, p, level):
+        nodes = self.nodes
+        i = self.size - p[level]
+        while i <= self.size:
+            node = nodes.get(i)
+            if node is None:
+                if self.dimensions == 3:
+                    node = _Staircase()
+                else:
+                    node = _DominanceTree(self.size, self.dimensions - 1)
+                nodes[i] = node
+            node.add(p, level + 1)
+            i += i & -i
+
+
+class _TreeFront:
+    """
+    Pareto front for four or more objectives. Vectors are added best first
+    in the first objective and have been replaced by the ranks of their
+    values in each objective, so a vector is dominated by the front if the
+    dominance tree holds a vector at least as great in the other objectives.
+    """
+    def __init__(self, size, objectives):
+        self.tree = _DominanceTree(size, objectives - 1)
+
+    def dominates(self, f):
+        return self.tree.covers(f, 1)
+
+    def add(self, f):
+        self.tree.add(f, 1)
+
+
+def _ranks(vectors, objectives):
+    """
+    Returns the vectors with every value but the first replaced by its rank
+    among the values of its objective.
+    """
+    rank = []
+    for m in range(1, objectives):
+        values = sorted({f[m] for f in vectors})
+        rank.append({v: r for r, v in enumerate(values)})
+    return [(f[0],) + tuple(rank[m - 1][f[m]] for m in range(1, objectives)) for f in vectors]
+
+
+def non_dominated_sort(fitness):
+    """
+    Sorts fitness vectors into Pareto fronts. Returns a list of fronts, best
+    front first, where each front is a list of indices into fitness.
+
+    Equal vectors always share a front, so each distinct vector is placed
+    once. The distinct vectors are sorted lexicographically, best first, so
+    that a vector can only be dominated by vectors before it. Each vector is
+    then placed in the first front that doesn't dominate it, which is found
+    by binary search since a vector dominated by a front is dominated by all
+    fronts before it as well. This is O(N log N) for up to two objectives,
+    O(N log^2 N) for three and O(N log^(M-1) N) for M objectives above that.
+    """
+    groups = {}
+    for i, f in enumerate(fitness):
+        groups.setdefault(tuple(f), []).append(i)
+    vectors = sorted(groups, reverse=True)
+    if not vectors:
+        return []
+
+    objectives = len(vectors[0])
+    keys = vectors
+    if objectives <= 2:
+        front_type = _LastMemberFront
+    elif objectives == 3:
+        front_type = _StaircaseFront
+    else:
+        keys = _ranks(vectors, objectives)
+
+        def front_type():
+            return _TreeFront(len(vectors), objectives)
+
+    fronts = []
+    members = []
+    for f, key in zip(vectors, keys):
+        low = 0
+        high = len(fronts)
+        while low < high:
+            mid = (low + high) // 2
+            if fronts[mid].dominates(key):
+                low = mid + 1
+            else:
+                high = mid
+        if low == len(fronts):
+            fronts.append(front_type())
+            members.append([])
+        fronts[low].add(key)
+        members[low].extend(groups[f])
+
+    return members
+
+
+def crowding_distance(fitness, front):
+    """
+    Returns the crowding distance of each index in front, in the same order.
+    Boundary vectors of every objective get an infinite distance.
+    """
+    distance = dict.fromkeys(front, 0.0)
+    if len(front) < 3:
+        return [float('inf')] * len(front)
+
+    for m in range(len(fitness[front[0]])):
+        ordered = sorted(front, key=lambda i: fitness[i][m])
+        low = fitness[ordered[0]][m]
+        high = fitness[ordered[-1]][m]
+        distance[ordered[0]] = float('inf')
+        distance[ordered[-1]] = float('inf')
+        if high == low:
+            continue
+        for k in range(1, len(ordered) - 1):
+            distance[ordered[k]] += (fitness[ordered[k + 1]][m] - fitness[ordered[k - 1]][m]) / (high - low)
+
+    return [distance[i] for i in front]
+
+
+class ParetoSelector:
+    """
+    NSGA-II style selector for fitness vectors with one value per objective.
+    Individuals are ranked by Pareto front and, within a front, by crowding
+    distance. Parents are then picked by tournaments of the given size where
+    the best ranked individual wins. Greater values are better in every
+    objective.
+    """
+    normalize_fitness = False
+    vector_fitness = True
+
+    def __init__(self, size=2):
+        if size < 1:
+            raise RuntimeError('Tournament size must be at least 1')
+        self.size = size
+
+    def select(self, fitness, count):
+        fitness = [f if isinstance(f, tuple) else (f,) for f in fitness]
+        n = len(fitness)
+        rank = [0] * n
+        crowding = [0.0] * n
+        for r, front in enumerate(non_dominated_sort(fitness)):
+            for i, d in zip(front, crowding_distance(fitness, front)):
+                rank[i] = r
+                crowding[i] = d
+
+        randrange = random.randrange
+        indices = []
+        for i in range(count):
+            best = randrange(n)
+            for k in range(self.size - 1):
+                j = randrange(n)
+                if rank[j] < rank[best] or (rank[j] == rank[best] and crowding[j] > crowding[best]):
+                    best = j
+            indices.append(best)
+        return indices
+
+
+class NearestNeighbourSurrogate:
+    """
+    Cheap model of the fitness function that predicts the fitness of a dna
+    as the mean fitness of the most similar dnas evaluated so far. Dnas are
+    compared by the Euclidean distance of their features, as returned by
+    client.dna_features(). At most max_samples evaluated dnas are kept, the
+    oldest being replaced first.
+    """
+    def __init__(self, neighbours=5, max_samples=1000):
+        if neighbours < 1:
+            raise RuntimeError('Surrogate needs at least one neighbour')
+        self.neighbours = neighbours
+        self.max_samples = max_samples
+        self.features = []
+        self.fitness = []
+        self.next = 0
+
+    def get_size(self):
+        return len(self.features)
+
+    def add(self, features, fitness):
+        if len(self.features) < self.max_samples:
+            self.features.append(features)
+            self.fitness.append(fitness)
+        else:
+            self.features[self.next] = features
+            self.fitness[self.next] = fitness
+            self.next = (self.next + 1) % self.max_samples
+
+    def predict(self, features):
+        def distance(i):
+            return sum((a - b) * (a - b) for a, b in zip(self.features[i], features))
+
+        nearest = heapq.nsmallest(self.neighbours, range(len(self.features)), key=distance)
+        return sum(self.fitness[i] for i in nearest) / len(nearest)
+
+
+def rank_correlation(xs, ys):
+    """
+    Returns the Spearman rank correlation of two equally long sequences,
+    or None if it is undefined.
+    """
+    def ranks(values):
+        order = sorted(range(len(values)), key=values.__getitem__)
+        r = [0.0] * len(values)
+        i = 0
+        while i < len(order):
+            # Tied values share the mean of their ranks
+            j = i
+            while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+                j += 1
+            for k in range(i, j + 1):
+                r[order[k]] = (i + j) / 2
+            i = j + 1
+        return r
+
+    if len(xs) < 2:
+        return None
+    rx = ranks(xs)
+    ry = ranks(ys)
+    mx = sum(rx) / len(rx)
+    my = sum(ry) / len(ry)
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    vx = sum((a - mx) * (a - mx) for a in rx)
+    vy = sum((b - my) * (b - my) for b in ry)
+    if vx == 0 or vy == 0:
+        return None
+    return cov / math.sqrt(vx * vy)
+
+
+class TerminationController:
+    """
+    Decides when the engine should stop evolving. Each criterion is disabled
+    when None:
+      * max_generations: Stop once this many generations have been evaluated.
+      * max_evaluations: Stop once this many fitness evaluations are spent.
+      * time_budget: Stop once this many seconds have passed since the start.
+      * target_fitness: Stop once an individual reaches this fitness.
+      * stagnation_generations: Stop when the best fitness hasn't improved
+      for this many generations.
+    target_fitness and stagnation_generations only apply to scalar fitness.
+    """
+    def __init__(self, max_generations=None, max_evaluations=None,
+                 time_budget=None, target_fitness=None,
+                 stagnation_generations=None):
+        self.max_generations = max_generations
+        self.max_evaluations = max_evaluations
+        self.time_budget = time_budget
+        self.target_fitness = target_fitness
+        self.stagnation_generations = stagnation_generations
+        self.start_time = None
+        self.best_fitness = None
+        self.improved_generation = None
+        self.reason = None
+
+    def has_criteria(self, vector_fitness=False):
+        """
+        Returns True if any criterion that can be met is set. With
+        vector_fitness, target_fitness and stagnation_generations can't.
+        """
+        criteria = [self.max_generations, self.max_evaluations, self.time_budget]
+        if not vector_fitness:
+            criteria.extend([self.target_fitness, self.stagnation_generations])
+        return any(c is not None for c in criteria)
+
+    def start(self):
+        self.start_time = time.monotonic()
+
+    def get_elapsed(self):
+        if self.start_time is None:
+            return 0
+        return time.monotonic() - self.start_time
+
+    def check(self, generation, evaluations, best_fitness):
+        """
+        Called once a generation has been evaluated, with the best fitness
+        evaluated in it, or None if not known. Returns the name of the
+        criterion that is met, or None to continue.
+        """
+        if best_fitness is not None:
+            if self.best_fitness is None or best_fitness > self.best_fitness:
+                self.best_fitness = best_fitness
+                self.improved_generation = generation
+
+        if self.target_fitness is not None and best_fitness is not None \
+                and best_fitness >= self.target_fitness:
+            self.reason = 'target_fitness'
+        elif self.max_generations is not None and generation >= self.max_generations:
+            self.reason = 'max_generations'
+        elif self.max_evaluations is not None and evaluations >= self.max_evaluations:
+            self.reason = 'max_evaluations'
+        elif self.time_budget is not None and self.get_elapsed() >= self.time_budget:
+            self.reason = 'time_budget'
+        elif self.stagnation_generations is not None and self.improved_generation is not None \
+                and generation - self.improved_generation >= self.stagnation_generations:
+            self.reason = 'stagnation_generations'
+        return self.reason
+
+
 class BaseIndividualMixin:
     """
     Objects that have a DNA and are part of the simulation should inherit or
@@ -54,6 +913,7 @@ class BaseIndividualMixin:
     def __init__(self):
         self.dna = None
         self.fitness = 0
+        self.inheritance = (None, 0)
 
     def set_fitness(self, fitness):
         self.fitness = fitness
@@ -67,6 +927,19 @@ class BaseIndividualMixin:
     def get_dna(self):
         return self.dna
 
+    def set_inheritance(self, parent, length):
+        self.inheritance = (parent, length)
+
+    def get_inheritance(self):
+        """
+        Returns a (parent, length) tuple telling that the first length genes
+        of the dna are the very same gene objects as those of the parent at
+        index parent in the previous generation. parent is None if nothing
+        is known to be inherited. Only set when the engine is configured to
+        track inheritance.
+        """
+        return self.inheritance
+
 
 class Population:
     def __init__(self, engine):
@@ -88,28 +961,11 @@ class Population:
         """
         Select an individual based on fitness distribution
         """
-        # Special handling if all individuals have zero fitness
-        # In that case, just pick any
-        allzero = True
-        for ind in self.individuals:
-            if ind.get_fitness() > 0:
-                allzero = False
+        i = FitnessProportionalSelector().select(self.get_fitness_list(), 1)[0]
+        return self.individuals[i]
 
-        if allzero:
-            return self.individuals[random.randint(0, len(self.individuals) - 1)]
-
-        # Monte-Carlo style accept-reject algorithm
-        # Assumes that fitness is normalized between 0 and 1
-        timeout = 1000000
-        while timeout > 0:
-            i = random.randint(0, len(self.individuals) - 1)
-            u = random.random()
-            if u <= self.individuals[i].fitness:
-                return self.individuals[i]
-            timeout -= 1
-        # We can get here in case all individuals have 0 fitness
-        # so just pick any.
-        return self.individuals[random.randint(0, len(self.individuals) - 1)]
+    def get_fitness_list(self):
+        return [ind.get_fitness() for ind in self.individuals]
 
     def get_size(self):
         return len(self.individuals)
@@ -129,10 +985,44 @@ class Engine:
         self.generation = 1
         self.population = None
         self.combinator = ElementWiseCombinator()
+        self.mutator = None
+        self.scheduler = None
+        self.selector = FitnessProportionalSelector()
         self.pop_size = 3
         self.mutate_probability = 0.01
         self.initialized = False
 
+        # Retired individuals are only kept for recycling if the client knows
+        # how to reset them. Otherwise they are simply dropped.
+        self.recycle_individuals = callable(getattr(client, 'reset_individual', None))
+        self.individual_pool = []
+
+        # Raw fitness of the individuals and the (p1, p2) indices of their
+        # parents in the previous generation, or None for the initial one.
+        self.raw_fitness = []
+        self.parents = None
+        self.history = None
+
+        # Surrogate pre-screening is disabled unless configured
+        self.surrogate = None
+        self.surrogate_fraction = 1.0
+        self.surrogate_neighbours = 5
+        self.surrogate_samples = 1000
+        self.surrogate_audit = 0
+        self.surrogate_report = None
+
+        self.track_inheritance = False
+        self.genome_chunk_size = None
+
+        # Strict mode, where breeding waits for the whole evaluation, unless
+        # configured otherwise
+        self.pipeline_fraction = None
+        self.bred = None
+
+        self.termination = TerminationController()
+        self.evaluations = 0
+        self.best_fitness = None
+
     def _get_configuration(self):
         config = self.client.get_configuration()
         # TODO: Rewrite this more elegantly and less verbose ...
@@ -146,6 +1036,25 @@ class Engine:
         except:
             pass
 
+        self.surrogate_fraction = config.get('surrogate_fraction', self.surrogate_fraction)
+        self.surrogate_neighbours = config.get('surrogate_neighbours', self.surrogate_neighbours)
+        self.surrogate_samples = config.get('surrogate_samples', self.surrogate_samples)
+        self.surrogate_audit = config.get('surrogate_audit', self.surrogate_audit)
+        self.track_inheritance = config.get('track_inheritance', self.track_inheritance)
+        self.genome_chunk_size = config.get('genome_chunk_size', self.genome_chunk_size)
+        self.pipeline_fraction = config.get('pipeline_fraction', self.pipeline_fraction)
+        self.termination = TerminationController(
+            config.get('max_generations'), config.get('max_evaluations'),
+            config.get('time_budget'), config.get('target_fitness'),
+            config.get('stagnation_generations'))
+        if self.surrogate_fraction < 1:
+            # The surrogate only starts predicting once it has seen a full
+            # population, which it never does if it can't remember one.
+            if self.surrogate_samples < self.pop_size:
+                raise RuntimeError('surrogate_samples must be at least population_size')
+            self.surrogate = NearestNeighbourSurrogate(self.surrogate_neighbours,
+                                                       self.surrogate_samples)
+
     def set_mutation_probability(self, p):
         """
         Set the probability of gene mutation. p should be in the range [0, 1]
@@ -167,34 +1076,115 @@ class Engine:
 
         for i in range(pop_size):
             dna = self.client.create_dna()
-            ind = self.client.create_individual()
-            ind.set_dna(dna)
-            self.population.add(ind)
+            if self.genome_chunk_size is not None:
+                dna = Genome(dna, self.genome_chunk_size)
+            self.population.add(self._create_individual(dna))
+
+    def _create_individual(self, dna):
+        """
+        Returns an individual with the given dna. Retired individuals are
+        recycled through client.reset_individual when available, otherwise a
+        new one is created with client.create_individual.
+        """
+        if self.individual_pool:
+            ind = self.individual_pool.pop()
+            self.client.reset_individual(ind, dna)
+            return ind
+
+        ind = self.client.create_individual()
+        ind.set_dna(dna)
+        return ind
 
-    def _select_parents(self):
-        p1 = self.population.select_individual()
-        p2 = self.population.select_individual()
-        return p1, p2
+    def _retire(self, individuals):
+        """
+        Hands individuals that are no longer part of the population to the
+        pool so that they can be recycled for the next generation.
+        """
+        if self.recycle_individuals:
+            self.individual_pool.extend(individuals)
+
+    def _select_parents(self, fitness, count):
+        """
+        Selects the parents of count individuals of the next generation in
+        one batch. Returns a list of (p1, p2) index pairs into fitness.
+        """
+        indices = self.selector.select(fitness, 2 * count)
+        return list(zip(indices[0::2], indices[1::2]))
 
     def _mutate(self, dna, probability):
-        new_dna = list(dna)
+        new_dna = copy_dna(dna)
         for i in range(len(dna)):
             if random.random() < probability:
                 new_dna = self.client.mutate_dna(new_dna)
         return new_dna
 
+    def _breed(self, individuals, parents):
+        """
+        Returns the dna of a child of each (p1, p2) pair of indices into
+        individuals.
+        """
+        pairs = [(individuals[i1], individuals[i2]) for i1, i2 in parents]
+        if hasattr(self.combinator, 'combine_all'):
+            new_dnas = self.combinator.combine_all(pairs)
+        else:
+            new_dnas = [self.combinator.combine(p1, p2) for p1, p2 in pairs]
+
+        if self.mutator is not None:
+            new_dnas = self.mutator.mutate_all(new_dnas, self.mutate_probability)
+        else:
+            new_dnas = [self._mutate(dna, self.mutate_probability) for dna in new_dnas]
+
+        if self.genome_chunk_size is not None:
+            new_dnas = [dna if isinstance(dna, Genome) else Genome(dna, self.genome_chunk_size)
+                        for dna in new_dnas]
+        return new_dnas
+
     def _evolve(self):
-        new_individuals = []
+        individuals = self.population.individuals
+        if self.bred is not None:
+            # Already bred while the population was being evaluated
+            self.parents, new_dnas = self.bred
+            self.bred = None
+        else:
+            fitness = self.population.get_fitness_list()
+            self.parents = self._select_parents(fitness, len(fitness))
+            new_dnas = self._breed(individuals, self.parents)
+
+        if self.track_inheritance:
+            inheritance = [self._inheritance(dna, individuals, i1, i2)
+                           for dna, (i1, i2) in zip(new_dnas, self.parents)]
 
-        for i in range(self.population.get_size()):
-            p1, p2 = self._select_parents()
-            new_dna = self.combinator.combine(p1, p2)
-            new_dna = self._mutate(new_dna, self.mutate_probability)
-            new_individual = self.client.create_individual()
-            new_individual.set_dna(new_dna)
-            new_individuals.append(new_individual)
+        # All parents have been selected, so the current generation can be
+        # retired and its individuals reused for the new one.
+        self._retire(self.population.individuals)
+        self.population.set_individuals([self._create_individual(dna) for dna in new_dnas])
 
-        self.population.set_individuals(new_individuals)
+        if self.track_inheritance:
+            for ind, (parent, length) in zip(self.population.individuals, inheritance):
+                ind.set_inheritance(parent, length)
+
+    def _inheritance(self, dna, individuals, i1, i2):
+        """
+        Returns the parent index that dna shares the longest prefix of gene
+        objects with, and the length of that prefix.
+        """
+        n1 = self._inherited_prefix(dna, individuals[i1].get_dna())
+        n2 = self._inherited_prefix(dna, individuals[i2].get_dna())
+        if n2 > n1:
+            return i2, n2
+        if n1 > 0:
+            return i1, n1
+        return None, 0
+
+    def _inherited_prefix(self, dna, parent_dna):
+        if isinstance(dna, Genome) and dna.is_compatible(parent_dna):
+            return dna.common_prefix(parent_dna)
+        n = 0
+        for gene, parent_gene in zip(dna, parent_dna):
+            if gene is not parent_gene:
+                break
+            n += 1
+        return n
 
     def set_combinator(self, combinator):
         """
@@ -203,9 +1193,56 @@ class Engine:
         of two parents and returns a combined DNA.
         The combine() function should take two objects of that inherit from
         BaseIndividualMixin and return a list of genes.
+        A combinator can also have a combine_all() method, which the engine
+        then calls instead with a list of all (p1, p2) pairs of a generation
+        and which returns a list with the genes of each child.
         """
         self.combinator = combinator
 
+    def set_mutator(self, mutator):
+        """
+        A client can set a mutator object to use instead of
+        client.mutate_dna(). The mutator object must have a mutate_all()
+        method which the engine calls with the dnas of all children of a
+        generation and the mutation probability, and which returns a list of
+        mutated dnas. It must not change the dnas it is given, since they may
+        be shared with the parents. Pass None to use client.mutate_dna()
+        again.
+        """
+        self.mutator = mutator
+
+    def set_selector(self, selector):
+        """
+        A client can set a custom selector object. The selector object must
+        have a select() method which the engine calls with a list of fitness
+        values and the number of parents to select, and which returns a list
+        of indices into the fitness list. It must also have a
+        normalize_fitness attribute telling whether the engine should
+        normalize fitness to the range [0, 1] before selection, and a
+        vector_fitness attribute telling whether it accepts fitness vectors.
+        """
+        self.selector = selector
+
+    def set_scheduler(self, scheduler):
+        """
+        Sets an object that evaluates fitness instead of the client's
+        evaluate_population(), such as scheduler.EvaluationScheduler. Its
+        evaluate() method is called with client.evaluate_fitness and a list
+        of individuals, and must return the fitness of each. Pass None to
+        evaluate in the engine's thread again.
+        """
+        self.scheduler = scheduler
+
+    def set_history_recorder(self, recorder):
+        """
+        Sets an object that records every generation once it has been
+        evaluated, such as history.HistoryRecorder. Its record_generation()
+        method is called with the generation number, the individuals, their
+        raw fitness and the indices of their parents. Pass None to stop
+        recording.
+        """
+        self.history = recorder
+
     def population_iterator(self):
         """
         Returns an iterator to the list of individuals in the population.
@@ -215,32 +1252,187 @@ class Engine:
         return self.population.iterator()
 
     def _evaluate_all(self, engine):
-        fitness_list = []
-        max_fitness = 0
+        # Collect fitness value for each individual
+        individuals = self.population.individuals
+        if self.surrogate is not None:
+            fitness_list = self._evaluate_with_surrogate(individuals)
+        elif self.pipeline_fraction is not None:
+            fitness_list = self._evaluate_pipelined(individuals)
+            self.best_fitness = self._best(fitness_list)
+        else:
+            fitness_list = self._evaluate(individuals)
+            self.best_fitness = self._best(fitness_list)
 
-        # Collect fitness value for each individual as well as
-        # find maximum fitness in the population
-        for ind in self.population_iterator():
-            fitness = self.client.evaluate_fitness(ind)
+        self.raw_fitness, fitness_list = self._prepare_fitness(fitness_list)
+        for ind, fitness in zip(self.population_iterator(), fitness_list):
+            ind.set_fitness(fitness)
+
+    def _prepare_fitness(self, fitness_list):
+        """
+        Returns the raw fitness values and the values to select parents by.
+        """
+        if any(isinstance(fitness, (tuple, list)) for fitness in fitness_list):
+            if not self.selector.vector_fitness:
+                raise RuntimeError('Selector does not support vector fitness')
+            fitness_list = [tuple(fitness) for fitness in fitness_list]
+
+        # Selectors that only compare fitness values don't need the
+        # normalization pass.
+        if self.selector.normalize_fitness:
+            return fitness_list, self._normalize(fitness_list)
+        return fitness_list, fitness_list
+
+    def _evaluate_pipelined(self, individuals):
+        """
+        Evaluates the individuals, and as soon as the fitness of
+        pipeline_fraction of them is known, breeds the next generation from
+        those in a background thread while the rest are evaluated. Only the
+        individuals whose evaluation finished first can become parents.
+        """
+        n = len(individuals)
+        k = min(n, max(1, math.ceil(n * self.pipeline_fraction)))
+        completed = []
+        fitness_list = [None] * n
+        breeders = []
+        outcome = {}
+
+        def breed(indices, fitness):
+            try:
+                fitness = self._prepare_fitness(fitness)[1]
+                parents = [(indices[i1], indices[i2])
+                           for i1, i2 in self._select_parents(fitness, n)]
+                new_dnas = []
+                for i in range(0, n, PIPELINE_BATCH):
+                    new_dnas.extend(self._breed(individuals, parents[i:i + PIPELINE_BATCH]))
+                    # Let the evaluation run as soon as it has something to
+                    # do, rather than when the interpreter switches threads.
+                    time.sleep(0)
+                outcome['bred'] = (parents, new_dnas)
+            except BaseException as e:
+                outcome['error'] = e
+
+        def on_result(i, fitness):
+            fitness_list[i] = fitness
+            completed.append(i)
+            if len(completed) == k:
+                indices = list(completed)
+                breeder = threading.Thread(target=breed, name='breeder',
+                                           args=(indices, [fitness_list[i] for i in indices]))
+                breeders.append(breeder)
+                breeder.start()
+
+        try:
+            self._evaluate(individuals, on_result)
+        finally:
+            for breeder in breeders:
+                breeder.join()
+        if 'error' in outcome:
+            raise outcome['error']
+
+        self.bred = outcome['bred']
+        return fitness_list
+
+    def _evaluate_with_surrogate(self, individuals):
+        """
+        Evaluates only the fraction of the individuals that the surrogate
+        predicts to be the fittest, and assigns the predicted fitness to the
+        rest. Until the surrogate has seen a full population, everyone is
+        evaluated.
+
+        The accuracy of the predictions is measured on surrogate_audit
+        randomly picked individuals that are evaluated although they were
+        predicted, or on the chosen individuals if there are none. The
+        chosen ones are those predicted to be the fittest, so the latter
+        says little about the accuracy for the rest.
+        """
+        features = [self.client.dna_features(ind.get_dna()) for ind in individuals]
+        n = len(individuals)
+
+        if self.surrogate.get_size() < n:
+            fitness_list = self._evaluate(individuals)
+            predicted = None
+            chosen = range(n)
+        else:
+            predicted = [self.surrogate.predict(f) for f in features]
+            fitness_list = list(predicted)
+            count = max(1, math.ceil(n * self.surrogate_fraction))
+            chosen = heapq.nlargest(count, range(n), key=predicted.__getitem__)
+            rest = sorted(set(range(n)).difference(chosen))
+            audited = random.sample(rest, min(self.surrogate_audit, len(rest)))
+            chosen.extend(audited)
+            evaluated = self._evaluate([individuals[i] for i in chosen])
+            for i, fitness in zip(chosen, evaluated):
+                fitness_list[i] = fitness
+
+        for i in chosen:
+            if isinstance(fitness_list[i], (tuple, list)):
+                raise RuntimeError('Surrogate does not support vector fitness')
+            self.surrogate.add(features[i], fitness_list[i])
+
+        # Predicted fitness doesn't count towards the stopping criteria
+        self.best_fitness = self._best([fitness_list[i] for i in chosen])
+
+        self.surrogate_report = {'evaluated': len(chosen),
+                                 'predicted': n - len(chosen),
+                                 'audited': 0,
+                                 'mean_absolute_error': None,
+                                 'rank_correlation': None}
+        if predicted is not None:
+            measured = audited or chosen
+            self.surrogate_report['audited'] = len(audited)
+            actual = [fitness_list[i] for i in measured]
+            guessed = [predicted[i] for i in measured]
+            errors = [abs(a - g) for a, g in zip(actual, guessed)]
+            self.surrogate_report['mean_absolute_error'] = sum(errors) / len(errors)
+            self.surrogate_report['rank_correlation'] = rank_correlation(actual, guessed)
+
+        return fitness_list
+
+    def _evaluate(self, individuals, on_result=None):
+        """
+        Returns the fitness of each of the individuals, evaluated by the
+        client in one batch. If given, on_result is called with the index and
+        fitness of each individual as soon as its fitness is known. Without
+        a scheduler, that means evaluating them one at a time with
+        client.evaluate_fitness.
+        """
+        if self.scheduler is not None:
+            fitness_list = self.scheduler.evaluate(self.client.evaluate_fitness, individuals,
+                                                   on_result)
+        elif on_result is not None:
+            fitness_list = []
+            for i, ind in enumerate(individuals):
+                fitness_list.append(self.client.evaluate_fitness(ind))
+                on_result(i, fitness_list[i])
+        else:
+            fitness_list = self.client.evaluate_population(individuals)
+        if len(fitness_list) != len(individuals):
+            raise RuntimeError('Client must return one fitness per individual')
+        self.evaluations += len(individuals)
+        return fitness_list
 
-            if fitness < 0:
-                raise RuntimeError('Fitness can not be negative')
+    def _best(self, fitness_list):
+        """
+        Returns the greatest fitness, or None for vector fitness.
+        """
+        if any(isinstance(fitness, (tuple, list)) for fitness in fitness_list):
+            return None
+        return max(fitness_list, default=None)
 
-            fitness_list.append(fitness)
+    def _normalize(self, fitness_list):
+        """
+        Returns the fitness values normalized to the range [0, 1]
+        """
+        if any(fitness < 0 for fitness in fitness_list):
+            raise RuntimeError('Fitness can not be negative')
 
-            if fitness > max_fitness:
-                max_fitness = fitness
+        max_fitness = max(fitness_list, default=0)
 
         # Avoid division by zero below
         if max_fitness == 0:
             max_fitness = 1
 
-        # Normalize fitness to range [0, 1]
-        i = 0
-        for ind in self.population_iterator():
-            fitness_list[i] /= max_fitness
-            ind.set_fitness(fitness_list[i])
-            i += 1
+        return [fitness / max_fitness for fitness in fitness_list]
 
     def initialize(self):
         """
@@ -252,6 +1444,7 @@ class Engine:
             self.client.on_init(self)
             self._get_configuration()
             self._populate(self.pop_size)
+            self.termination.start()
             self.client.on_new_population(self.generation)
         else:
             raise RuntimeError("Engine already initialized")
@@ -260,16 +1453,67 @@ class Engine:
     def evolve(self):
         """
         The client should call this every time it wishes to have a new
-        generation of the population generated.
+        generation of the population generated. Returns False without
+        generating a new generation once a stopping criterion is met, and
+        True otherwise.
         """
         if not self.initialized:
             raise RuntimeError("Engine not initialized")
 
+        if self.termination.reason is not None:
+            return False
+
         self._evaluate_all(self)
+        if self.history is not None:
+            self.history.record_generation(self.generation, self.population.individuals,
+                                           self.raw_fitness, self.parents)
+        if self.surrogate is not None:
+            self.client.on_surrogate_report(self.generation, self.surrogate_report)
         self.client.on_evaluated(self.generation)
+
+        if self.termination.check(self.generation, self.evaluations, self.best_fitness):
+            return False
+
         self._evolve()
         self.generation += 1
         self.client.on_new_population(self.generation)
+        return True
+
+    def run(self):
+        """
+        Initializes the engine if needed and evolves until a stopping
+        criterion is met. Returns the same report as get_termination_report().
+        """
+        if not self.initialized:
+            self.initialize()
+        if not self.termination.has_criteria():
+            raise RuntimeError('No stopping criteria configured')
+
+        while self.evolve():
+            # Only now is it known whether the fitness is a vector
+            vector_fitness = any(isinstance(f, tuple) for f in self.raw_fitness)
+            if not self.termination.has_criteria(vector_fitness):
+                raise RuntimeError('target_fitness and stagnation_generations only apply '
+                                   'to scalar fitness, so no stopping criterion can be met')
+
+        return self.get_termination_report()
+
+    def get_termination_report(self):
+        """
+        Returns a dictionary with the 'reason' the engine stopped, which is
+        the configuration key of the criterion that was met or None if it
+        hasn't stopped, the number of 'generations' evaluated, the number of
+        fitness 'evaluations' spent, the 'elapsed' time in seconds and the
+        'best_fitness' evaluated.
+        """
+        generations = self.generation
+        if self.termination.reason is None:
+            generations -= 1
+        return {'reason': self.termination.reason,
+                'generations': generations,
+                'evaluations': self.evaluations,
+                'elapsed': self.termination.get_elapsed(),
+                'best_fitness': self.termination.best_fitness}
 
 
 class BaseClient:
@@ -309,6 +1553,17 @@ class BaseClient:
         """
         raise NotImplementedError('You must implement create_individual')
 
+    # Optionally, a client can also implement the method below. If it does,
+    # the engine recycles the individuals of the previous generation instead
+    # of calling create_individual for every new individual.
+    #
+    # def reset_individual(self, ind, dna):
+    #     """
+    #     Called by the engine to reuse a retired individual. Should restore
+    #     the individual to the state of a newly created one and give it
+    #     the dna.
+    #     """
+
     def on_init(self, engine):
         """
         Called by the engine before any other function in the client is called.
@@ -331,9 +1586,42 @@ class BaseClient:
         """
         pass
 
+    def on_surrogate_report(self, generation, report):
+        """
+        Called by the engine after each generation has been evaluated when a
+        surrogate is used. report is a dictionary with the number of
+        individuals that were 'evaluated' and 'predicted', how many of the
+        evaluated ones were 'audited', and the 'mean_absolute_error' and
+        'rank_correlation' of the predictions, which are None when nothing
+        was predicted. The predictions are compared with the fitness of the
+        audited individuals, or with that of all evaluated individuals if
+        none were audited. The latter are the ones predicted to be fittest,
+        which makes their predictions look more accurate than they are.
+        """
+        pass
+
+    def dna_features(self, dna):
+        """
+        Called by the engine when a surrogate is used. Should return a list
+        of numbers describing the dna, such that similar dnas have similar
+        fitness.
+        """
+        raise NotImplementedError('You must implement dna_features to use a surrogate')
+
+    def evaluate_population(self, individuals):
+        """
+        Called by the engine to evaluate a list of individuals. Should return
+        a list with the fitness of each. By default evaluate_fitness is
+        called for each individual, but a client can override this to
+        evaluate them all in one batch.
+        """
+        return [self.evaluate_fitness(ind) for ind in individuals]
+
     def evaluate_fitness(self, ind):
         """
         Should calculate and return the fitness of the individual.
+        When using a selector that supports it, such as ParetoSelector, a tuple
+        with one fitness value per objective can be returned instead.
         """
         raise NotImplementedError('You must implement evaluate_fitness')
 
@@ -358,7 +1646,9 @@ class ExampleClient(BaseClient):
         self.engine = engine
 
     def get_configuration(self):
-        return {'population_size': 8}
+        # Every matching letter squares the fitness, starting at 2
+        return {'population_size': 8,
+                'target_fitness': 2 ** (2 ** len(self.target))}
 
     def on_new_population(self, generation):
         self.generation = generation
@@ -372,6 +1662,10 @@ class ExampleClient(BaseClient):
     def create_individual(self):
         return BaseIndividualMixin()
 
+    def reset_individual(self, ind, dna):
+        ind.set_dna(dna)
+        ind.set_fitness(0)
+
     def mutate_dna(self, dna):
         i = random.randint(0, len(dna) - 1)
         dna[i] = random.choice(string.ascii_lowercase + ' ')
@@ -397,6 +1691,6 @@ class ExampleClient(BaseClient):
 if __name__ == '__main__':
     client = ExampleClient('to be or not to be')
     engine = Engine(client)
-    engine.initialize()
-    while not client.is_done():
-        engine.evolve()
+    report = engine.run()
+    print('Stopped by {} after {} generations and {} evaluations.'.format(
+        report['reason'], report['generations'], report['evaluations']))
@@ -0,0 +1,276 @@
+"""
+Recording of the genomes, fitness values and parents of every generation to
+file, and reading them back for analysis.
+
+The file starts with a header followed by one fixed size record per
+individual, stored generation after generation. Records are written with
+struct directly into a memory map of the file, so recording costs no
+pickling, and any generation can be read back without loading the rest of
+the run. For that, fitness values are stored as doubles: integers too large
+for a double, such as the ones of gengine.ExampleClient, are stored as
+infinity.
+"""
+import mmap
+import struct
+
+MAGIC = b'GENHIST1'
+
+# magic, dna size, population size, objectives, first generation,
+# number of generations, gene format
+HEADER = struct.Struct('<8sIIIII32s')
+HEADER_SIZE = 64
+GENERATIONS_OFFSET = struct.calcsize('<8sIIII')
+
+NO_PARENT = -1
+
+
+def _record_struct(dna_size, objectives, gene_format):
+    return struct.Struct('<ii' + 'd' * objectives + gene_format * dna_size)
+
+
+def _values_per_gene(gene_format):
+    size = struct.calcsize('<' + gene_format)
+    return len(struct.unpack('<' + gene_format, bytes(size)))
+
+
+def _to_double(value):
+    try:
+        return float(value)
+    except OverflowError:
+        return float('inf') if value > 0 else float('-inf')
+
+
+def _fitness_tuple(fitness):
+    if isinstance(fitness, (tuple, list)):
+        return tuple(_to_double(f) for f in fitness)
+    return (_to_double(fitness),)
+
+
+class HistoryRecorder:
+    """
+    Appends each evaluated generation to a history file. Pass it to
+    engine.set_history_recorder() to have the engine record every generation
+    after it has been evaluated.
+
+    gene_format is the struct format of a single gene, e.g. 'd' for a float or
+    '2d' for a vector. encode_gene should return a tuple with the values of a
+    gene matching gene_format. By default the gene itself is the only value.
+    Fitness values are stored as doubles, with values too large for a double
+    stored as infinity.
+    """
+    def __init__(self, path, gene_format='d', encode_gene=None):
+        if len(gene_format) > 32:
+            raise RuntimeError('Gene format too long')
+        self.path = path
+        self.gene_format = gene_format
+        self.encode_gene = encode_gene
+        self.file = None
+        self.map = None
+        self.record = None
+        self.dna_size = 0
+        self.pop_size = 0
+        self.objectives = 0
+        self.first_generation = 0
+        self.generations = 0
+
+    def _open(self, generation, individuals, fitness_list):
+        self.dna_size = len(individuals[0].get_dna())
+        self.pop_size = len(individuals)
+        self.objectives = len(_fitness_tuple(fitness_list[0]))
+        self.first_generation = generation
+        self.record = _record_struct(self.dna_size, self.objectives, self.gene_format)
+
+        self.file = open(self.path, 'w+b')
+        self.file.truncate(HEADER_SIZE + self._generation_size())
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        HEADER.pack_into(self.map, 0, MAGIC, self.dna_size, self.pop_size,
+                         self.objectives, self.first_generation, 0,
+                         self.gene_format.encode())
+
+    def _generation_size(self):
+        return self.pop_size * self.record.size
+
+    def record_generation(self, generation, individuals, fitness_list, parents=None):
+        """
+        Appends a generation. fitness_list holds the raw fitness of each
+        individual and parents a (p1, p2) pair of indices into the previous
+        generation for each individual, or None for an initial population.
+        """
+        if self.map is None:
+            self._open(generation, individuals, fitness_list)
+
+        if len(individuals) != self.pop_size:
+            raise RuntimeError('Population size must not change while recording')
+        if generation != self.first_generation + self.generations:
+            raise RuntimeError('Generations must be recorded in order')
+
+        end = HEADER_SIZE + (self.generations + 1) * self._generation_size()
+        if end > len(self.map):
+            # Grow geometrically to keep the number of resizes low
+            self.map.resize(max(end, 2 * len(self.map)))
+
+        offset = end - self._generation_size()
+        encode = self.encode_gene
+        for i, ind in enumerate(individuals):
+            if parents is None:
+                p1, p2 = NO_PARENT, NO_PARENT
+            else:
+                p1, p2 = parents[i]
+            values = [p1, p2]
+            values.extend(_fitness_tuple(fitness_list[i]))
+            if encode is None:
+                values.extend(ind.get_dna())
+            else:
+                for gene in ind.get_dna():
+                    values.extend(encode(gene))
+            self.record.pack_into(self.map, offset, *values)
+            offset += self.record.size
+
+        # The generation only counts once all of its records are written
+        self.generations += 1
+        struct.pack_into('<I', self.map, GENERATIONS_OFFSET, self.generations)
+
+    def close(self):
+        if self.map is None:
+            return
+        size = HEADER_SIZE + self.generations * self._generation_size()
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(size)
+        self.file.close()
+        self.map = None
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HistoryReader:
+    """
+    Reads a history file written by HistoryRecorder. The file is memory
+    mapped, so only the generations that are accessed are loaded.
+
+    decode_gene is called with the values of a gene, as a tuple, and should
+    return the gene. By default single values are returned as is and
+    multiple values as a tuple.
+    """
+    def __init__(self, path, decode_gene=None):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.dna_size, self.pop_size, self.objectives,
+         self.first_generation, self.generations,
+         gene_format) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise RuntimeError('Not a history file: {}'.format(path))
+
+        self.gene_format = gene_format.rstrip(b'\0').decode()
+        self.gene_size = _values_per_gene(self.gene_format)
+        self.decode_gene = decode_gene
+        self.record = _record_struct(self.dna_size, self.objectives, self.gene_format)
+        self.parents_struct = struct.Struct('<ii')
+        self.fitness_struct = struct.Struct('<' + 'd' * self.objectives)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_generations(self):
+        """
+        Returns the range of recorded generations.
+        """
+        return range(self.first_generation, self.first_generation + self.generations)
+
+    def _offset(self, generation, index):
+        if generation not in self.get_generations():
+            raise IndexError('Generation {} not recorded'.format(generation))
+        if index < 0 or index >= self.pop_size:
+            raise IndexError('Individual {} out of range'.format(index))
+        n = (generation - self.first_generation) * self.pop_size + index
+        return HEADER_SIZE + n * self.record.size
+
+    def _fitness(self, fitness):
+        if self.objectives == 1:
+            return fitness[0]
+        return fitness
+
+    def _genome(self, values):
+        genes = values[2 + self.objectives:]
+        n = self.gene_size
+        if self.decode_gene is not None:
+            return [self.decode_gene(genes[i:i + n]) for i in range(0, len(genes), n)]
+        if n == 1:
+            return list(genes)
+        return [genes[i:i + n] for i in range(0, len(genes), n)]
+
+    def get_individual(self, generation, index):
+        """
+        Returns a (parents, fitness, genome) tuple for an individual.
+        parents is None for individuals of an initial population.
+        """
+        values = self.record.unpack_from(self.map, self._offset(generation, index))
+        parents = values[0:2]
+        if parents[0] == NO_PARENT:
+            parents = None
+        return parents, self._fitness(values[2:2 + self.objectives]), self._genome(values)
+
+    def get_genome(self, generation, index):
+        return self.get_individual(generation, index)[2]
+
+    def get_fitness(self, generation, index):
+        offset = self._offset(generation, index) + self.parents_struct.size
+        return self._fitness(self.fitness_struct.unpack_from(self.map, offset))
+
+    def get_parents(self, generation, index):
+        """
+        Returns the (p1, p2) indices of the parents of an individual in the
+        previous generation, or None if it has no recorded parents.
+        """
+        parents = self.parents_struct.unpack_from(self.map, self._offset(generation, index))
+        if parents[0] == NO_PARENT:
+            return None
+        return parents
+
+    def get_generation_fitness(self, generation):
+        """
+        Returns the fitness of every individual in a generation. Only the
+        fitness values of the records are read, not the genes.
+        """
+        offset = self._offset(generation, 0) + self.parents_struct.size
+        unpack = self.fitness_struct.unpack_from
+        size = self.record.size
+        return [self._fitness(unpack(self.map, offset + i * size))
+                for i in range(self.pop_size)]
+
+    def get_ancestors(self, generation, index, depth=None):
+        """
+        Returns the ancestors of an individual, one generation at a time,
+        going back at most depth generations. Each item in the returned list
+        is a sorted list of indices into the generation before the previous
+        item, starting with the parents of the individual.
+        """
+        ancestors = []
+        current = {index}
+        while current and (depth is None or len(ancestors) < depth):
+            if generation - 1 not in self.get_generations():
+                break
+            previous = set()
+            for i in current:
+                parents = self.get_parents(generation, i)
+                if parents is not None:
+                    previous.update(parents)
+            if not previous:
+                break
+            generation -= 1
+            ancestors.append(sorted(previous))
+            current = previous
+        return ancestors
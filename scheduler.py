@@ -0,0 +1,209 @@
+"""
+Evaluation of fitness in worker threads or processes, with protection
+against individuals whose evaluation is slow or never finishes.
+"""
+import concurrent.futures
+import math
+import statistics
+import time
+
+
+def percentile(ordered, p):
+    """
+    Returns the p:th percentile of a sorted list using the nearest rank
+    method, or None if the list is empty.
+    """
+    if not ordered:
+        return None
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+class EvaluationScheduler:
+    """
+    Evaluates the fitness of a generation in a pool of workers. Pass it to
+    engine.set_scheduler() to have the engine evaluate every generation with
+    it.
+
+    * workers: The number of evaluations running at the same time.
+    * kind: 'thread' or 'process'. With processes, the client and the
+    individuals are pickled, so changes evaluate_fitness makes to them are
+    lost.
+    * timeout: Seconds an evaluation may run before the individual is given
+    the penalty fitness instead. None waits forever.
+    * penalty: The fitness of individuals whose evaluation timed out.
+    * speculative_fraction: Once all evaluations have started and at most
+    this fraction of the generation is left, evaluations that have run
+    speculative_factor times longer than the median evaluation are started
+    again on an idle worker. The first copy to finish is used.
+
+    Workers busy with evaluations that timed out or lost to a speculative
+    copy are not given new work, and if no worker is left, a new pool is
+    started. With process workers, the pool is also replaced once the
+    generation is done if any of them is still busy, and the processes of
+    the old pool are terminated, as they are by close(). A running
+    evaluation in a thread can't be stopped, so with thread workers, an
+    evaluation that never finishes keeps its thread busy for good and keeps
+    the program from exiting.
+    """
+    def __init__(self, workers=4, kind='thread', timeout=None, penalty=0,
+                 speculative_fraction=0.1, speculative_factor=2.0):
+        if kind not in ('thread', 'process'):
+            raise RuntimeError('Unknown worker kind: {}'.format(kind))
+        if workers < 1:
+            raise RuntimeError('At least one worker is needed')
+        self.workers = workers
+        self.kind = kind
+        self.timeout = timeout
+        self.penalty = penalty
+        self.speculative_fraction = speculative_fraction
+        self.speculative_factor = speculative_factor
+        self.executor = None
+        self.report = None
+        # Evaluations still running although their result isn't needed
+        self.abandoned = set()
+
+    def _start_executor(self):
+        if self.kind == 'thread':
+            self.executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+        else:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+
+    def close(self):
+        """
+        Shuts the pool down without waiting for running evaluations. Process
+        workers are terminated, in case they are stuck in an evaluation.
+        """
+        if self.executor is not None:
+            # The pool forgets its processes when shut down
+            processes = list((getattr(self.executor, '_processes', None) or {}).values())
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+            self.executor = None
+        self.abandoned = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def evaluate(self, evaluate_fitness, individuals, on_result=None):
+        """
+        Returns the fitness of each individual as returned by
+        evaluate_fitness, or the penalty for those that timed out. If given,
+        on_result is called with the index and fitness of each individual as
+        soon as its fitness is known, in the order they finish.
+        """
+        if self.executor is None:
+            self._start_executor()
+
+        n = len(individuals)
+        results = [None] * n
+        finished = [False] * n
+        remaining = n
+        pending = list(range(n - 1, -1, -1))
+        # Future -> (index, start time) of the evaluations still needed
+        running = {}
+        copies = [0] * n
+        copy_futures = set()
+        latencies = []
+        timeouts = 0
+        speculative = 0
+        speculative_wins = 0
+        begin = time.monotonic()
+
+        def submit(i):
+            future = self.executor.submit(evaluate_fitness, individuals[i])
+            running[future] = (i, time.monotonic())
+            copies[i] += 1
+            return future
+
+        def finish(i, result):
+            results[i] = result
+            finished[i] = True
+            if on_result is not None:
+                on_result(i, result)
+            # Other copies of the evaluation are no longer needed
+            for future, (j, start) in list(running.items()):
+                if j == i:
+                    del running[future]
+                    if not future.cancel():
+                        self.abandoned.add(future)
+
+        while remaining > 0:
+            self.abandoned = {f for f in self.abandoned if not f.done()}
+            if not running and len(self.abandoned) >= self.workers:
+                # Every worker is stuck with work nobody waits for
+                self.close()
+                self._start_executor()
+
+            while pending and len(running) + len(self.abandoned) < self.workers:
+                submit(pending.pop())
+
+            now = time.monotonic()
+            deadlines = []
+            speculating = not pending and remaining <= max(1, self.speculative_fraction * n) \
+                and latencies and self.speculative_factor is not None
+            if speculating:
+                slow = statistics.median(latencies) * self.speculative_factor
+            for future, (i, start) in list(running.items()):
+                if self.timeout is not None:
+                    deadlines.append(start + self.timeout)
+                if speculating and copies[i] == 1:
+                    if now - start < slow:
+                        deadlines.append(start + slow)
+                    elif len(running) + len(self.abandoned) < self.workers:
+                        copy_futures.add(submit(i))
+                        speculative += 1
+
+            wait = None
+            if deadlines:
+                wait = max(0, min(deadlines) - now)
+            done, _ = concurrent.futures.wait(list(running) + list(self.abandoned), timeout=wait,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                if future not in running:
+                    continue
+                i, start = running[future]
+                latencies.append(time.monotonic() - start)
+                if future in copy_futures:
+                    speculative_wins += 1
+                finish(i, future.result())
+                remaining -= 1
+
+            if self.timeout is not None:
+                now = time.monotonic()
+                for future, (i, start) in list(running.items()):
+                    if not finished[i] and now - start >= self.timeout:
+                        finish(i, self.penalty)
+                        remaining -= 1
+                        timeouts += 1
+
+        if self.kind == 'process' and any(not f.done() for f in self.abandoned):
+            # Don't leave processes stuck in evaluations nobody waits for
+            self.close()
+
+        ordered = sorted(latencies)
+        self.report = {'evaluated': len(latencies),
+                       'timeouts': timeouts,
+                       'speculative': speculative,
+                       'speculative_wins': speculative_wins,
+                       'elapsed': time.monotonic() - begin,
+                       'p50': percentile(ordered, 50),
+                       'p90': percentile(ordered, 90),
+                       'p99': percentile(ordered, 99),
+                       'max': ordered[-1] if ordered else None}
+        return results
+
+    def get_report(self):
+        """
+        Returns a dictionary describing the latest evaluate() call: the
+        number of individuals 'evaluated' and 'timeouts', the number of
+        'speculative' copies started and how many of them finished first
+        ('speculative_wins'), the 'elapsed' seconds and the 'p50', 'p90',
+        'p99' and 'max' latency in seconds of the finished evaluations.
+        """
+        return self.report
@@ -0,0 +1,103 @@
+"""
+Tests of gengine.Genome, compared with the list of its genes.
+
+Run from the repository root: python3 -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gengine  # noqa: E402
+
+
+class GenomeTest(unittest.TestCase):
+    def test_behaves_like_list(self):
+        for length in (0, 1, 31, 32, 33, 100):
+            genes = list(range(length))
+            genome = gengine.Genome(genes, 8)
+            with self.subTest(length=length):
+                self.assertEqual(len(genome), length)
+                self.assertEqual(list(genome), genes)
+                self.assertEqual(genome, genes)
+                for i in range(-length, length):
+                    self.assertEqual(genome[i], genes[i])
+                for i in (length, length + 8, -length - 1):
+                    with self.assertRaises(IndexError):
+                        genome[i]
+                self.assertEqual(genome[3:17:2], genes[3:17:2])
+                self.assertEqual(genome[-5:], genes[-5:])
+
+    def test_random_sets_match_list(self):
+        random.seed(1)
+        genes = [random.random() for _ in range(50)]
+        genome = gengine.Genome(genes, 7)
+        for _ in range(200):
+            i = random.randrange(-50, 50)
+            gene = random.random()
+            genes[i] = gene
+            genome[i] = gene
+        self.assertEqual(genome, genes)
+        with self.assertRaises(IndexError):
+            genome[50] = 0
+
+    def test_copy_on_write(self):
+        genome = gengine.Genome(range(20), 4)
+        copy = gengine.copy_dna(genome)
+        copy[5] = 'x'
+        self.assertEqual(genome[5], 5)
+        self.assertEqual(copy[5], 'x')
+        # Only the chunk holding the gene was replaced
+        self.assertIsNot(copy.chunks[1], genome.chunks[1])
+        for c in (0, 2, 3, 4):
+            self.assertIs(copy.chunks[c], genome.chunks[c])
+
+    def test_splice(self):
+        a = gengine.Genome(range(0, 20), 4)
+        b = gengine.Genome(range(100, 120), 4)
+        for n in range(21):
+            child = a.splice(b, n)
+            with self.subTest(n=n):
+                self.assertEqual(child, list(range(0, n)) + list(range(100 + n, 120)))
+                # Whole chunks on either side of n are shared, not copied
+                for c, chunk in enumerate(child.chunks):
+                    if (c + 1) * 4 <= n:
+                        self.assertIs(chunk, a.chunks[c])
+                    elif c * 4 >= n:
+                        self.assertIs(chunk, b.chunks[c])
+
+    def test_common_prefix(self):
+        genes = [object() for _ in range(20)]
+        a = gengine.Genome(genes, 4)
+        b = gengine.Genome(genes, 4)
+        self.assertEqual(a.common_prefix(b), 20)
+        for i in (0, 6, 19):
+            child = a.copy()
+            child[i] = object()
+            self.assertEqual(a.common_prefix(child), i)
+        # Equal but distinct genes don't count as inherited
+        self.assertEqual(gengine.Genome([[1]], 4).common_prefix(gengine.Genome([[1]], 4)), 0)
+
+    def test_combinators_match_lists(self):
+        random.seed(2)
+        combinators = (gengine.ElementWiseCombinator(), gengine.RandomBreakpointCombinator(),
+                       gengine.RandomParentCombinator())
+        for combinator in combinators:
+            p1 = gengine.BaseIndividualMixin()
+            p2 = gengine.BaseIndividualMixin()
+            p1.set_dna(gengine.Genome(range(0, 40), 8))
+            p2.set_dna(gengine.Genome(range(100, 140), 8))
+            child = combinator.combine(p1, p2)
+            with self.subTest(combinator=type(combinator).__name__):
+                self.assertEqual(len(child), 40)
+                for i, gene in enumerate(child):
+                    self.assertIn(gene, (i, 100 + i))
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(RuntimeError):
+            gengine.Genome([1, 2], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
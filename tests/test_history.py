@@ -0,0 +1,117 @@
+"""
+Tests of history.HistoryRecorder and history.HistoryReader, by recording
+generations and reading them back.
+
+Run from the repository root: python3 -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gengine  # noqa: E402
+import history  # noqa: E402
+
+
+def create_individuals(dnas):
+    individuals = []
+    for dna in dnas:
+        ind = gengine.BaseIndividualMixin()
+        ind.set_dna(dna)
+        individuals.append(ind)
+    return individuals
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'history.bin')
+
+    def read(self, **kwargs):
+        reader = history.HistoryReader(self.path, **kwargs)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_round_trip(self):
+        generations = [
+            ([[0.5, 1.5], [2.5, 3.5], [4.5, 5.5]], [1, 2, 3], None),
+            ([[6.5, 7.5], [8.5, 9.5], [1.0, 2.0]], [4, 5, 6], [(0, 1), (2, 2), (1, 0)]),
+        ]
+        with history.HistoryRecorder(self.path) as recorder:
+            for g, (dnas, fitness, parents) in enumerate(generations, 3):
+                recorder.record_generation(g, create_individuals(dnas), fitness, parents)
+
+        reader = self.read()
+        self.assertEqual(reader.get_generations(), range(3, 5))
+        for g, (dnas, fitness, parents) in enumerate(generations, 3):
+            self.assertEqual(reader.get_generation_fitness(g), fitness)
+            for i in range(3):
+                self.assertEqual(reader.get_genome(g, i), dnas[i])
+                self.assertEqual(reader.get_fitness(g, i), fitness[i])
+                self.assertEqual(reader.get_parents(g, i), None if parents is None else parents[i])
+        self.assertEqual(reader.get_individual(4, 1), ((2, 2), 5, [8.5, 9.5]))
+
+    def test_vector_genes_and_fitness(self):
+        dnas = [[(1, 2), (3, 4)], [(5, 6), (7, 8)]]
+        fitness = [(1.0, -1.0), (2.0, -2.0)]
+        with history.HistoryRecorder(self.path, '2i', tuple) as recorder:
+            recorder.record_generation(0, create_individuals(dnas), fitness)
+
+        self.assertEqual(self.read().get_genome(0, 1), [(5, 6), (7, 8)])
+        reader = self.read(decode_gene=list)
+        self.assertEqual(reader.get_genome(0, 0), [[1, 2], [3, 4]])
+        self.assertEqual(reader.get_generation_fitness(0), fitness)
+
+    def test_encoded_genes(self):
+        with history.HistoryRecorder(self.path, 'c', lambda gene: (gene.encode(),)) as recorder:
+            recorder.record_generation(0, create_individuals(['abc', 'xyz']), [1, 2])
+        reader = self.read(decode_gene=lambda values: values[0].decode())
+        self.assertEqual(reader.get_genome(0, 1), ['x', 'y', 'z'])
+
+    def test_fitness_too_large_for_a_double(self):
+        with history.HistoryRecorder(self.path) as recorder:
+            recorder.record_generation(0, create_individuals([[0.0], [1.0], [2.0]]),
+                                       [2 ** 2048, -2 ** 2048, 2 ** 64])
+        self.assertEqual(self.read().get_generation_fitness(0),
+                         [float('inf'), float('-inf'), float(2 ** 64)])
+
+    def test_ancestors(self):
+        individuals = create_individuals([[0.0]] * 4)
+        with history.HistoryRecorder(self.path) as recorder:
+            recorder.record_generation(0, individuals, [0] * 4)
+            recorder.record_generation(1, individuals, [0] * 4, [(0, 1), (1, 1), (2, 3), (3, 3)])
+            recorder.record_generation(2, individuals, [0] * 4, [(0, 0), (1, 2), (3, 3), (3, 3)])
+
+        reader = self.read()
+        self.assertEqual(reader.get_ancestors(2, 1), [[1, 2], [1, 2, 3]])
+        self.assertEqual(reader.get_ancestors(2, 1, depth=1), [[1, 2]])
+        self.assertEqual(reader.get_ancestors(0, 1), [])
+
+    def test_invalid_recording(self):
+        with history.HistoryRecorder(self.path) as recorder:
+            recorder.record_generation(0, create_individuals([[0.0], [1.0]]), [0, 0])
+            with self.assertRaises(RuntimeError):
+                recorder.record_generation(2, create_individuals([[0.0], [1.0]]), [0, 0])
+            with self.assertRaises(RuntimeError):
+                recorder.record_generation(1, create_individuals([[0.0]]), [0])
+
+        reader = self.read()
+        self.assertEqual(reader.get_generations(), range(0, 1))
+        with self.assertRaises(IndexError):
+            reader.get_fitness(1, 0)
+        with self.assertRaises(IndexError):
+            reader.get_generation_fitness(1)
+        with self.assertRaises(IndexError):
+            reader.get_genome(0, 2)
+
+    def test_not_a_history_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(history.HEADER_SIZE))
+        with self.assertRaises(RuntimeError):
+            history.HistoryReader(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests of the Pareto sorting used by gengine.ParetoSelector, compared with
+a naive sort into fronts.
+
+Run from the repository root: python3 -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gengine  # noqa: E402
+
+
+def naive_fronts(fitness):
+    """
+    Returns the fronts as sets of indices, found by repeatedly taking the
+    vectors that no remaining vector dominates.
+    """
+    remaining = set(range(len(fitness)))
+    fronts = []
+    while remaining:
+        front = {i for i in remaining
+                 if not any(gengine.dominates(fitness[j], fitness[i]) for j in remaining)}
+        fronts.append(front)
+        remaining -= front
+    return fronts
+
+
+class NonDominatedSortTest(unittest.TestCase):
+    def assert_matches_naive(self, fitness):
+        fronts = gengine.non_dominated_sort(fitness)
+        self.assertEqual([set(front) for front in fronts], naive_fronts(fitness))
+        self.assertEqual(sorted(i for front in fronts for i in front), list(range(len(fitness))))
+
+    def test_random_vectors(self):
+        random.seed(1)
+        for objectives in range(1, 7):
+            for _ in range(5):
+                fitness = [tuple(random.random() for _ in range(objectives))
+                           for _ in range(150)]
+                with self.subTest(objectives=objectives):
+                    self.assert_matches_naive(fitness)
+
+    def test_ties_and_duplicates(self):
+        random.seed(2)
+        for objectives in range(1, 7):
+            for _ in range(5):
+                fitness = [tuple(random.randint(0, 3) for _ in range(objectives))
+                           for _ in range(150)]
+                with self.subTest(objectives=objectives):
+                    self.assert_matches_naive(fitness)
+
+    def test_empty(self):
+        self.assertEqual(gengine.non_dominated_sort([]), [])
+
+    def test_lists_are_accepted(self):
+        self.assertEqual(gengine.non_dominated_sort([[1, 2, 3, 4], [2, 3, 4, 5]]), [[1], [0]])
+
+
+class CrowdingDistanceTest(unittest.TestCase):
+    def test_boundaries_are_infinite(self):
+        fitness = [(0, 4), (1, 3), (2, 2), (4, 0)]
+        distance = gengine.crowding_distance(fitness, [0, 1, 2, 3])
+        self.assertEqual(distance[0], float('inf'))
+        self.assertEqual(distance[3], float('inf'))
+        self.assertAlmostEqual(distance[1], 2 / 4 + 2 / 4)
+        self.assertAlmostEqual(distance[2], 3 / 4 + 3 / 4)
+
+
+class ParetoSelectorTest(unittest.TestCase):
+    def test_prefers_first_front(self):
+        random.seed(3)
+        fitness = [(5, 5, 5, 5), (1, 1, 1, 1)]
+        picked = gengine.ParetoSelector(size=2).select(fitness, 1000)
+        # The dominated vector only wins when it meets itself, a quarter of
+        # the time
+        self.assertLess(picked.count(1), 350)
+
+if __name__ == '__main__':
+    unittest.main()
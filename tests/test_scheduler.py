@@ -0,0 +1,159 @@
+"""
+Tests of scheduler.EvaluationScheduler with fitness functions that sleep,
+in thread and process workers.
+
+Run from the repository root: python3 -m unittest discover tests
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import scheduler  # noqa: E402
+
+PENALTY = -1
+
+# An evaluation that takes this long counts as hung. The time limits the
+# tests check are far below it, and far above what they should take, so
+# that they hold on a busy machine.
+HANG = 60
+TIMEOUT = 1.0
+LIMIT = 15
+
+# Set at the end of each test to let evaluations hung in threads finish.
+# Evaluations in processes never see it and are terminated instead.
+RELEASE = threading.Event()
+
+
+def sleeping_fitness(individual):
+    """
+    Individuals are (fitness, seconds) pairs. Sleeps for the seconds and
+    returns the fitness.
+    """
+    fitness, seconds = individual
+    RELEASE.wait(seconds)
+    return fitness
+
+
+def slow_once_fitness(individual):
+    """
+    Individuals are (fitness, seconds, marker) tuples. Sleeps for the
+    seconds the first time an individual is evaluated, in any worker, and
+    returns the fitness right away after that.
+    """
+    fitness, seconds, marker = individual
+    try:
+        with open(marker, 'x'):
+            pass
+    except FileExistsError:
+        return fitness
+    RELEASE.wait(seconds)
+    return fitness
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = [1, 2, 3, 4, 5]
+        self.assertEqual(scheduler.percentile(values, 20), 1)
+        self.assertEqual(scheduler.percentile(values, 50), 3)
+        self.assertEqual(scheduler.percentile(values, 90), 5)
+        self.assertEqual(scheduler.percentile(values, 100), 5)
+        self.assertEqual(scheduler.percentile([1, 2, 3, 4], 50), 2)
+
+    def test_empty(self):
+        self.assertIsNone(scheduler.percentile([], 50))
+
+
+class SchedulerTestMixin:
+    kind = None
+
+    def setUp(self):
+        RELEASE.clear()
+        self.addCleanup(RELEASE.set)
+
+    def create_scheduler(self, **kwargs):
+        s = scheduler.EvaluationScheduler(kind=self.kind, penalty=PENALTY, **kwargs)
+        self.addCleanup(s.close)
+        return s
+
+    def test_results_in_order(self):
+        s = self.create_scheduler(workers=3)
+        individuals = [(i, 0.01 * (i % 3)) for i in range(10)]
+        self.assertEqual(s.evaluate(sleeping_fitness, individuals), list(range(10)))
+        report = s.get_report()
+        self.assertEqual(report['evaluated'], 10)
+        self.assertEqual(report['timeouts'], 0)
+
+    def test_on_result_in_finishing_order(self):
+        s = self.create_scheduler(workers=3, timeout=2 * TIMEOUT, speculative_fraction=0)
+        individuals = [(0, TIMEOUT), (1, HANG), (2, 0), (3, TIMEOUT / 2)]
+        results = []
+        s.evaluate(sleeping_fitness, individuals, lambda i, fitness: results.append((i, fitness)))
+        self.assertEqual(results, [(2, 2), (3, 3), (0, 0), (1, PENALTY)])
+
+    def test_timeout_gives_penalty(self):
+        s = self.create_scheduler(workers=2, timeout=TIMEOUT, speculative_fraction=0)
+        individuals = [(1, 0), (2, HANG), (3, 0), (4, 0)]
+        start = time.monotonic()
+        self.assertEqual(s.evaluate(sleeping_fitness, individuals), [1, PENALTY, 3, 4])
+        self.assertLess(time.monotonic() - start, LIMIT)
+        self.assertEqual(s.get_report()['timeouts'], 1)
+
+    def test_restarts_pool_when_all_workers_hang(self):
+        s = self.create_scheduler(workers=1, timeout=TIMEOUT, speculative_fraction=0)
+        start = time.monotonic()
+        self.assertEqual(s.evaluate(sleeping_fitness, [(1, HANG), (2, 0)]), [PENALTY, 2])
+        # The next generation doesn't wait for the hung worker either
+        self.assertEqual(s.evaluate(sleeping_fitness, [(3, 0), (4, 0)]), [3, 4])
+        self.assertLess(time.monotonic() - start, LIMIT)
+
+    def test_speculative_copy_wins(self):
+        s = self.create_scheduler(workers=4, speculative_fraction=0.25, speculative_factor=2.0)
+        with tempfile.TemporaryDirectory() as directory:
+            individuals = [(i, 0.05, os.path.join(directory, str(i))) for i in range(8)]
+            # The last individual hangs the first time it is evaluated
+            individuals[-1] = (7, HANG, individuals[-1][2])
+            start = time.monotonic()
+            self.assertEqual(s.evaluate(slow_once_fitness, individuals), list(range(8)))
+            self.assertLess(time.monotonic() - start, LIMIT)
+        report = s.get_report()
+        self.assertEqual(report['speculative'], 1)
+        self.assertEqual(report['speculative_wins'], 1)
+        self.assertEqual(report['timeouts'], 0)
+
+
+class ThreadSchedulerTest(SchedulerTestMixin, unittest.TestCase):
+    kind = 'thread'
+
+
+class ProcessSchedulerTest(SchedulerTestMixin, unittest.TestCase):
+    kind = 'process'
+
+    def run_program(self, code):
+        """
+        Runs code in a new interpreter and returns how long it took to exit.
+        """
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        start = time.monotonic()
+        subprocess.run([sys.executable, '-c', textwrap.dedent(code)], cwd=root, check=True,
+                       timeout=HANG)
+        return time.monotonic() - start
+
+    def test_hung_evaluation_does_not_delay_exit(self):
+        elapsed = self.run_program("""
+            import time
+            import scheduler
+
+            s = scheduler.EvaluationScheduler(kind='process', timeout={})
+            assert s.evaluate(time.sleep, [{}, 0]) == [0, None]
+            """.format(TIMEOUT, HANG))
+        self.assertLess(elapsed, LIMIT)
+
+
+if __name__ == '__main__':
+    unittest.main()
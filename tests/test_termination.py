@@ -0,0 +1,119 @@
+"""
+Tests of the stopping criteria of gengine.Engine.run().
+
+Run from the repository root: python3 -m unittest discover tests
+"""
+import os
+import random
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gengine  # noqa: E402
+
+
+class CountingClient(gengine.BaseClient):
+    """
+    Client whose dna is a list of numbers and whose fitness is their sum,
+    or a constant, or a vector of the numbers.
+    """
+    def __init__(self, config, fitness=None, vector=False, seconds=0):
+        self.config = config
+        self.fitness = fitness
+        self.vector = vector
+        self.seconds = seconds
+
+    def get_configuration(self):
+        return dict({'population_size': 10, 'mutation_p': 0.1}, **self.config)
+
+    def on_new_population(self, generation):
+        pass
+
+    def create_dna(self):
+        return [random.randint(0, 9) for _ in range(5)]
+
+    def mutate_dna(self, dna):
+        dna[random.randrange(len(dna))] = random.randint(0, 9)
+        return dna
+
+    def create_individual(self):
+        return gengine.BaseIndividualMixin()
+
+    def evaluate_fitness(self, ind):
+        time.sleep(self.seconds)
+        if self.vector:
+            return tuple(ind.get_dna()[:2])
+        if self.fitness is not None:
+            return self.fitness
+        return sum(ind.get_dna())
+
+
+def run(client, selector=None):
+    random.seed(1)
+    engine = gengine.Engine(client)
+    if selector is not None:
+        engine.set_selector(selector)
+    return engine.run()
+
+
+class TerminationTest(unittest.TestCase):
+    def test_max_generations(self):
+        report = run(CountingClient({'max_generations': 4}))
+        self.assertEqual(report['reason'], 'max_generations')
+        self.assertEqual(report['generations'], 4)
+        self.assertEqual(report['evaluations'], 40)
+
+    def test_max_evaluations(self):
+        report = run(CountingClient({'max_evaluations': 35}))
+        self.assertEqual(report['reason'], 'max_evaluations')
+        self.assertEqual(report['evaluations'], 40)
+
+    def test_time_budget(self):
+        report = run(CountingClient({'time_budget': 0.1}, seconds=0.005))
+        self.assertEqual(report['reason'], 'time_budget')
+        self.assertGreaterEqual(report['elapsed'], 0.1)
+
+    def test_target_fitness(self):
+        report = run(CountingClient({'target_fitness': 40, 'max_generations': 1000}))
+        self.assertEqual(report['reason'], 'target_fitness')
+        self.assertGreaterEqual(report['best_fitness'], 40)
+
+    def test_stagnation_generations(self):
+        report = run(CountingClient({'stagnation_generations': 3}, fitness=1))
+        self.assertEqual(report['reason'], 'stagnation_generations')
+        self.assertEqual(report['generations'], 4)
+        self.assertEqual(report['best_fitness'], 1)
+
+    def test_first_criterion_met_is_reported(self):
+        report = run(CountingClient({'max_generations': 2, 'max_evaluations': 1000}))
+        self.assertEqual(report['reason'], 'max_generations')
+
+    def test_no_criteria(self):
+        with self.assertRaises(RuntimeError):
+            run(CountingClient({}))
+
+    def test_scalar_criteria_with_vector_fitness(self):
+        client = CountingClient({'target_fitness': 40, 'stagnation_generations': 3}, vector=True)
+        with self.assertRaises(RuntimeError):
+            run(client, gengine.ParetoSelector())
+
+    def test_vector_fitness(self):
+        client = CountingClient({'target_fitness': 40, 'max_generations': 3}, vector=True)
+        report = run(client, gengine.ParetoSelector())
+        self.assertEqual(report['reason'], 'max_generations')
+        self.assertIsNone(report['best_fitness'])
+
+    def test_evolve_stops(self):
+        random.seed(1)
+        engine = gengine.Engine(CountingClient({'max_generations': 2}))
+        engine.initialize()
+        self.assertIsNone(engine.get_termination_report()['reason'])
+        self.assertTrue(engine.evolve())
+        self.assertFalse(engine.evolve())
+        self.assertFalse(engine.evolve())
+        self.assertEqual(engine.get_termination_report()['generations'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()